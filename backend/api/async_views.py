@@ -0,0 +1,152 @@
+"""Асинхронные GET-эндпоинты рецептов, ингредиентов и тегов.
+
+Запись, HEAD/OPTIONS, browsable API и курсорная пагинация остаются
+за синхронными вьюсетами: async_read_view передаёт им такие запросы.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, NotFound)
+from rest_framework.request import Request
+
+from api.authentication import AsyncTokenAuthentication
+from api.cache import aget_cached_feed, aget_recipe_payloads
+from api.filters import RecipeFilter
+from api.indexes import ingredient_index
+from api.pagination import RecipePagination
+from api.renderers import JSONRenderer
+from api.serializers import (IngredientSerializer, RecipeSerializer,
+                             TagSerializer, render_recipe_payloads)
+from api.utils import aget_recipe_flags, get_limit
+from recipes.models import Ingredient, Recipe, Tag
+
+from backend import performance
+
+renderer = JSONRenderer()
+authentication = AsyncTokenAuthentication()
+
+
+def render(data, status=200, headers=None):
+    return HttpResponse(renderer.render(data), status=status,
+                        content_type=renderer.media_type, headers=headers)
+
+
+def handle_exception(exc):
+    headers = None
+    if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        headers = {'WWW-Authenticate': authentication.keyword}
+    if isinstance(exc.detail, (list, dict)):
+        return render(exc.detail, exc.status_code, headers)
+    return render({'detail': exc.detail}, exc.status_code, headers)
+
+
+def async_read_view(async_view, sync_view):
+    """GET без text/html обслуживает async_view; если она вернула None
+    или метод другой, запрос уходит синхронному sync_view."""
+
+    async def view(request, *args, **kwargs):
+        if (request.method == 'GET'
+                and 'text/html' not in request.headers.get('Accept', '')):
+            try:
+                response = await async_view(request, *args, **kwargs)
+            except APIException as exc:
+                response = handle_exception(exc)
+            if response is not None:
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    view.cls = sync_view.cls
+    view.actions = sync_view.actions
+    return view
+
+
+async def get_request(request):
+    request = Request(request)
+    user_auth = await authentication.aauthenticate(request)
+    request.user = user_auth[0] if user_auth else AnonymousUser()
+    return request
+
+
+async def serialize_recipes(request, recipes):
+    serializer = RecipeSerializer(context={
+        'request': request,
+        'recipe_flags': await aget_recipe_flags(request.user, recipes)})
+    with performance.timed_serialization():
+        payloads = await aget_recipe_payloads(
+            recipes, sync_to_async(render_recipe_payloads))
+        return [serializer.merge_flags(payloads[recipe.id], recipe)
+                for recipe in recipes]
+
+
+async def recipe_list(request):
+    pagination = RecipePagination()
+    if pagination.use_cursor(Request(request)):
+        return None
+    request = await get_request(request)
+    paginator = pagination.page_number_class()
+
+    async def render_page():
+        filterset = RecipeFilter(
+            request.query_params,
+            queryset=Recipe.objects.select_related('author'),
+            request=request)
+        if not await sync_to_async(filterset.is_valid)():
+            raise translate_validation(filterset.errors)
+        recipes = await paginator.apaginate_queryset(filterset.qs, request)
+        return paginator.get_paginated_response(
+            await serialize_recipes(request, recipes)).data
+
+    if request.user.is_authenticated:
+        return render(await render_page())
+    data, etag = await aget_cached_feed(request, render_page)
+    if data is None:
+        return HttpResponse(status=304, headers={'ETag': etag})
+    return render(data, headers={'ETag': etag})
+
+
+async def recipe_detail(request, pk):
+    request = await get_request(request)
+    try:
+        recipe = await Recipe.objects.select_related('author').aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise NotFound
+    return render((await serialize_recipes(request, [recipe]))[0])
+
+
+async def ingredient_list(request):
+    request = await get_request(request)
+    name = request.query_params.get('name')
+    if name is not None:
+        return render(await ingredient_index.asearch(
+            name, get_limit(request)))
+    ingredients = [ingredient async for ingredient
+                   in Ingredient.objects.all().aiterator()]
+    return render(performance.get_data(
+        IngredientSerializer(ingredients, many=True)))
+
+
+async def ingredient_detail(request, pk):
+    await get_request(request)
+    try:
+        ingredient = await Ingredient.objects.aget(pk=pk)
+    except Ingredient.DoesNotExist:
+        raise NotFound
+    return render(performance.get_data(IngredientSerializer(ingredient)))
+
+
+async def tag_list(request):
+    await get_request(request)
+    tags = [tag async for tag in Tag.objects.all().aiterator()]
+    return render(performance.get_data(TagSerializer(tags, many=True)))
+
+
+async def tag_detail(request, pk):
+    await get_request(request)
+    try:
+        tag = await Tag.objects.aget(pk=pk)
+    except Tag.DoesNotExist:
+        raise NotFound
+    return render(performance.get_data(TagSerializer(tag)))
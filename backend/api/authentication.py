@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш токен -> (пользователь, токен) с TTL.
+
+    Живёт в памяти процесса: удаление токена и изменение пользователя
+    сбрасывают запись только в своём процессе, в остальных она
+    устаревает не позже чем через ttl секунд.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        user, token = entry[0]
+        # Копии, чтобы запросы не делили изменяемые экземпляры моделей.
+        return copy.copy(user), copy.copy(token)
+
+    def set(self, key, user_token):
+        if not self.maxsize:
+            return
+        with self.lock:
+            self.entries[key] = (user_token, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in [key for key, ((user, _), _) in self.entries.items()
+                        if user.pk == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.entries)}
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE,
+                         settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не ходит в базу за токеном, пока
+    тот лежит в token_cache."""
+
+    def authenticate_credentials(self, key):
+        user_token = token_cache.get(key)
+        if user_token is None:
+            user_token = super().authenticate_credentials(key)
+            token_cache.set(key, user_token)
+        return user_token
+
+
+class AsyncTokenAuthentication(TokenAuthentication):
+    """Заголовок разбирает TokenAuthentication, а токен читается
+    из token_cache или через async ORM в aauthenticate."""
+
+    def authenticate_credentials(self, key):
+        return key
+
+    async def aauthenticate(self, request):
+        key = self.authenticate(request)
+        if key is None:
+            return None
+        user_token = token_cache.get(key)
+        if user_token is not None:
+            return user_token
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.set(key, (token.user, token))
+        return token.user, token
@@ -0,0 +1,382 @@
+import asyncio
+import base64
+import io
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import async_views
+from api.authentication import token_cache
+from api.search import get_search_backend
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from recipes import shopping_list
+from recipes.counters import reconcile
+from recipes.scores import refresh
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+BATCH_SIZE = 5000
+BULK_SIZE = 20
+# Подписки и корзина пользователя бенчмарка.
+SEED_SUBSCRIPTIONS = 30
+SEED_CART = 50
+TAGS = (('Завтрак', '#E26C2D', 'breakfast'),
+        ('Обед', '#49B64E', 'lunch'),
+        ('Ужин', '#8775D2', 'dinner'))
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), '#E26C2D').save(buffer, format='PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def seed(ingredients_path, recipes_count, users_count, seed_value=0):
+    if users_count < SEED_SUBSCRIPTIONS or recipes_count < SEED_CART:
+        raise RuntimeError(
+            f'Нужно не меньше {SEED_SUBSCRIPTIONS} пользователей и '
+            f'{SEED_CART} рецептов')
+    rnd = random.Random(seed_value)
+    with open(ingredients_path, encoding='utf-8') as file:
+        Ingredient.objects.bulk_create(
+            (Ingredient(**line) for line in json.load(file)),
+            batch_size=BATCH_SIZE)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tags = [Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS]
+    password = make_password('benchmark')
+    User.objects.bulk_create(
+        (User(email=f'user{index}@foodgram.ru',
+              username=f'user{index}',
+              first_name='Имя',
+              last_name='Фамилия',
+              password=password) for index in range(users_count)),
+        batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        (Recipe(author_id=rnd.choice(user_ids),
+                name=f'Рецепт {index}',
+                text='Описание рецепта ' * 20,
+                cooking_time=rnd.randint(5, 180),
+                image='recipes/benchmark.png')
+         for index in range(recipes_count)),
+        batch_size=BATCH_SIZE)
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id,
+                          ingredient_id=ingredient_id,
+                          amount=rnd.randint(1, 500))
+         for recipe_id in recipe_ids
+         for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 8))),
+        batch_size=BATCH_SIZE)
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+         for recipe_id in recipe_ids
+         for tag in rnd.sample(tags, rnd.randint(1, len(tags)))),
+        batch_size=BATCH_SIZE)
+    subscriptions, favorites, carts = [], [], []
+    for user_id in user_ids:
+        subscriptions.extend(
+            Subscription(subscriber_id=user_id, author_id=author_id)
+            for author_id in set(rnd.sample(user_ids, 10)) - {user_id})
+        favorites.extend(
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in rnd.sample(recipe_ids, 10))
+        carts.extend(
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in rnd.sample(recipe_ids, 5))
+    Subscription.objects.bulk_create(subscriptions, batch_size=BATCH_SIZE)
+    Favorite.objects.bulk_create(favorites, batch_size=BATCH_SIZE)
+    ShoppingCart.objects.bulk_create(carts, batch_size=BATCH_SIZE)
+    user = User.objects.create_user(email='benchmark@foodgram.ru',
+                                    username='benchmark',
+                                    first_name='Бенчмарк',
+                                    last_name='Бенчмарк',
+                                    password='benchmark')
+    Subscription.objects.bulk_create(
+        Subscription(subscriber=user, author_id=author_id)
+        for author_id in rnd.sample(user_ids, SEED_SUBSCRIPTIONS))
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe_id=recipe_id)
+        for recipe_id in rnd.sample(recipe_ids, SEED_CART))
+    shopping_list.rebuild()
+    reconcile()
+    refresh(full=True)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        get_search_backend().index(recipe_ids[start:start + BATCH_SIZE])
+    return user
+
+
+def mirror_replicas():
+    """Реплики читают ту же тестовую базу, что и default."""
+    for alias in settings.DATABASE_REPLICAS:
+        connections[alias].creation.set_as_test_mirror(
+            connection.settings_dict)
+
+
+def get_scenarios(user, repeat):
+    recipe_ids = list(Recipe.objects.exclude(author=user).exclude(
+        favorite__user=user).exclude(shoppingcart__user=user)
+        .values_list('id', flat=True)[:1000])
+    author_ids = list(User.objects.exclude(id=user.id).exclude(
+        author__subscriber=user).values_list('id', flat=True)[:1000])
+    # Первая половина id уходит одиночным сценариям (по одному на
+    # повтор и замер памяти), вторая — пакетным.
+    minimum = 2 * (repeat + 1)
+    for label, ids in (('чужих рецептов вне избранного и корзины',
+                        recipe_ids),
+                       ('авторов без подписки', author_ids)):
+        if len(ids) < minimum:
+            raise RuntimeError(
+                f'Для --repeat {repeat} нужно не меньше {minimum} '
+                f'{label}, есть {len(ids)}: увеличьте --recipes/--users '
+                f'или уменьшите --repeat')
+    recipe = Recipe.objects.first()
+    deep_page = max(1, Recipe.objects.filter(tags__slug='lunch').count()
+                    // settings.REST_FRAMEWORK['PAGE_SIZE'])
+    ingredient = Ingredient.objects.first()
+    pantry = ','.join(str(pk) for pk in Ingredient.objects.values_list(
+        'id', flat=True)[:200])
+    tag = Tag.objects.first()
+    created = []
+
+    def bulk_ids(ids, index):
+        # На малом наборе пакеты идут по второй половине по кругу.
+        half = ids[len(ids) // 2:]
+        start = index * BULK_SIZE % len(half)
+        return {'ids': half[start:start + BULK_SIZE]}
+
+    def recipe_payload():
+        return {'ingredients': [{'id': ingredient.id, 'amount': 10}],
+                'tags': [tag.id],
+                'image': make_image(),
+                'name': 'Рецепт бенчмарка',
+                'text': 'Описание',
+                'cooking_time': 10}
+
+    def create_recipe(client, index):
+        response = client.post('/api/recipes/', recipe_payload(),
+                               format='json')
+        created.append(response.data['id'])
+        return response
+
+    return (
+        ('users-list', lambda client, index: client.get('/api/users/')),
+        ('users-retrieve',
+         lambda client, index: client.get(f'/api/users/{author_ids[0]}/')),
+        ('users-me', lambda client, index: client.get('/api/users/me/')),
+        ('users-subscriptions', lambda client, index: client.get(
+            '/api/users/subscriptions/?recipes_limit=3')),
+        ('users-subscribe', lambda client, index: client.post(
+            f'/api/users/{author_ids[index]}/subscribe/')),
+        ('users-unsubscribe', lambda client, index: client.delete(
+            f'/api/users/{author_ids[index]}/subscribe/')),
+        ('users-subscribe-bulk', lambda client, index: client.post(
+            '/api/users/subscribe/', bulk_ids(author_ids, index),
+            format='json')),
+        ('ingredients-list',
+         lambda client, index: client.get('/api/ingredients/')),
+        ('ingredients-search',
+         lambda client, index: client.get('/api/ingredients/?name=ка')),
+        ('ingredients-retrieve', lambda client, index: client.get(
+            f'/api/ingredients/{ingredient.id}/')),
+        ('tags-list', lambda client, index: client.get('/api/tags/')),
+        ('tags-retrieve',
+         lambda client, index: client.get(f'/api/tags/{tag.id}/')),
+        ('recipes-list', lambda client, index: client.get('/api/recipes/')),
+        ('recipes-list-deep', lambda client, index: client.get(
+            f'/api/recipes/?page={deep_page}&tags=lunch')),
+        ('recipes-list-cursor', lambda client, index: client.get(
+            '/api/recipes/?pagination=cursor&tags=lunch')),
+        ('recipes-list-popular', lambda client, index: client.get(
+            '/api/recipes/?ordering=popular&tags=lunch')),
+        ('recipes-list-trending-cursor', lambda client, index: client.get(
+            '/api/recipes/?ordering=trending&pagination=cursor')),
+        ('recipes-feed', lambda client, index: client.get(
+            '/api/recipes/feed/')),
+        ('recipes-search', lambda client, index: client.get(
+            '/api/recipes/?search=рецепт 12')),
+        ('recipes-what-can-i-cook', lambda client, index: client.get(
+            f'/api/recipes/what_can_i_cook/?ingredients={pantry}')),
+        ('recipes-list-anonymous', lambda client, index: APIClient().get(
+            '/api/recipes/?limit=6')),
+        ('recipes-retrieve',
+         lambda client, index: client.get(f'/api/recipes/{recipe.id}/')),
+        ('recipes-create', create_recipe),
+        ('recipes-update', lambda client, index: client.patch(
+            f'/api/recipes/{created[index]}/', recipe_payload(),
+            format='json')),
+        ('recipes-update-amount', lambda client, index: client.patch(
+            f'/api/recipes/{created[index]}/',
+            {'ingredients': [{'id': ingredient.id, 'amount': 20 + index}]},
+            format='json')),
+        ('recipes-destroy', lambda client, index: client.delete(
+            f'/api/recipes/{created[index]}/')),
+        ('recipes-favorite', lambda client, index: client.post(
+            f'/api/recipes/{recipe_ids[index]}/favorite/')),
+        ('recipes-unfavorite', lambda client, index: client.delete(
+            f'/api/recipes/{recipe_ids[index]}/favorite/')),
+        ('recipes-shopping-cart', lambda client, index: client.post(
+            f'/api/recipes/{recipe_ids[index]}/shopping_cart/')),
+        ('recipes-favorite-bulk', lambda client, index: client.post(
+            '/api/recipes/favorite/', bulk_ids(recipe_ids, index),
+            format='json')),
+        ('recipes-shopping-cart-bulk', lambda client, index: client.post(
+            '/api/recipes/shopping_cart/', bulk_ids(recipe_ids, index),
+            format='json')),
+        ('recipes-download-shopping-cart', lambda client, index: client.get(
+            '/api/recipes/download_shopping_cart/')),
+        ('recipes-remove-shopping-cart', lambda client, index: client.delete(
+            f'/api/recipes/{recipe_ids[index]}/shopping_cart/')),
+    )
+
+
+def consume(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def measure(client, name, request, repeat):
+    timings, queries = [], 0
+    for index in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = request(client, index)
+            consume(response)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{name}: HTTP {response.status_code} {consume(response)}')
+        queries = max(queries, len(context.captured_queries))
+    return {'name': name,
+            'queries': queries,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p99_ms': round(percentile(timings, 99), 2)}
+
+
+def measure_memory(client, request, index):
+    tracemalloc.start()
+    try:
+        consume(request(client, index))
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(user, repeat):
+    token_cache.clear()
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    results = []
+    for name, request in get_scenarios(user, repeat):
+        result = measure(client, name, request, repeat)
+        result['peak_kb'] = measure_memory(client, request, repeat)
+        results.append(result)
+    return results
+
+
+def check_budgets(results, budgets):
+    errors = []
+    for result in results:
+        budget = budgets.get(result['name'], {})
+        for metric in ('queries', 'p50_ms', 'p99_ms', 'peak_kb'):
+            if metric in budget and result[metric] > budget[metric]:
+                errors.append(f'{result["name"]}: {metric} '
+                              f'{result[metric]} > {budget[metric]}')
+    return errors
+
+
+def get_throughput_scenarios():
+    recipe = Recipe.objects.first()
+    return (
+        ('tags-list', '/api/tags/',
+         TagViewSet.as_view({'get': 'list'}), async_views.tag_list, {}),
+        ('ingredients-search', '/api/ingredients/?name=ка',
+         IngredientViewSet.as_view({'get': 'list'}),
+         async_views.ingredient_list, {}),
+        ('recipes-list', '/api/recipes/',
+         RecipeViewSet.as_view({'get': 'list'}),
+         async_views.recipe_list, {}),
+        ('recipes-retrieve', f'/api/recipes/{recipe.id}/',
+         RecipeViewSet.as_view({'get': 'retrieve'}),
+         async_views.recipe_detail, {'pk': recipe.id}),
+    )
+
+
+def measure_sync_throughput(view, path, kwargs, headers, requests,
+                            threads, delay):
+    factory = RequestFactory()
+
+    def handle(index):
+        # Медленный клиент держит синхронный поток воркера всё время
+        # передачи запроса и ответа.
+        time.sleep(delay)
+        response = view(factory.get(path, **headers), **kwargs)
+        response.render()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(handle, range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def measure_async_throughput(view, path, kwargs, headers, requests,
+                             concurrency, delay):
+    factory = AsyncRequestFactory()
+
+    async def handle(semaphore):
+        async with semaphore:
+            await asyncio.sleep(delay)
+            response = await view(factory.get(path, **headers), **kwargs)
+            response.content
+
+    async def handle_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(handle(semaphore) for _ in range(requests)))
+
+    started = time.perf_counter()
+    async_to_sync(handle_all)()
+    return requests / (time.perf_counter() - started)
+
+
+def compare_async(user, requests, threads, concurrency, delay):
+    """Пропускная способность одного воркера: синхронные вьюсеты в пуле
+    из threads потоков против async-представлений в одном event loop.
+    delay имитирует медленного клиента перед каждым запросом."""
+    token, _ = Token.objects.get_or_create(user=user)
+    headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+    results = []
+    for name, path, sync_view, async_view, kwargs in (
+            get_throughput_scenarios()):
+        sync_rps = measure_sync_throughput(
+            sync_view, path, kwargs, headers, requests, threads, delay)
+        async_rps = measure_async_throughput(
+            async_view, path, kwargs, headers, requests, concurrency, delay)
+        results.append({'name': name,
+                        'sync_rps': round(sync_rps, 1),
+                        'async_rps': round(async_rps, 1),
+                        'speedup': round(async_rps / sync_rps, 2)})
+    return results
@@ -0,0 +1,94 @@
+"""Пакетное добавление в избранное, список покупок и подписки.
+
+Существование объектов и уже имеющиеся связи проверяются одним
+IN-запросом, новые связи вставляются одним bulk_create. bulk_create не
+шлёт post_save, поэтому счётчики, рейтинги, список покупок и кэш ленты
+подписок обновляются здесь же.
+
+Проверка и вставка идут под блокировкой строки пользователя (lock_user),
+которую берут и одиночные добавления: иначе параллельная вставка между
+ними попала бы в created, хотя bulk_create её пропустил, и счётчики со
+списком покупок учли бы связь дважды.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from api.cache import invalidate_subscription_feeds
+from recipes import shopping_list
+from recipes.counters import increment
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.scores import update_scores
+from users.models import Subscription, User
+
+CREATED = 'created'
+EXISTS = 'exists'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def lock_user(user):
+    """Блокирует строку пользователя до конца транзакции."""
+    User.objects.select_for_update().only('pk').get(pk=user.pk)
+
+
+def find(queryset, ids, links):
+    """{id: уже связан} для существующих объектов из ids."""
+    return dict(queryset.filter(id__in=ids).annotate(
+        linked=Exists(links)).values_list('id', 'linked'))
+
+
+def get_outcomes(ids, found, created, statuses=None):
+    statuses = statuses or {}
+    created = set(created)
+    return [{'id': pk,
+             'status': statuses.get(pk) or (
+                 CREATED if pk in created
+                 else EXISTS if pk in found else NOT_FOUND)}
+            for pk in ids]
+
+
+def link_recipes(model, user, ids):
+    lock_user(user)
+    found = find(Recipe.objects, ids, model.objects.filter(
+        user=user, recipe=OuterRef('pk')))
+    created = [pk for pk, linked in found.items() if not linked]
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=pk) for pk in created],
+        ignore_conflicts=True)
+    return found, created
+
+
+@transaction.atomic
+def add_favorites(user, ids):
+    found, created = link_recipes(Favorite, user, ids)
+    increment(Recipe, created, 'favorites_count')
+    update_scores('favorite', created)
+    return get_outcomes(ids, found, created)
+
+
+@transaction.atomic
+def add_to_cart(user, ids):
+    found, created = link_recipes(ShoppingCart, user, ids)
+    increment(Recipe, created, 'cart_count')
+    update_scores('cart', created)
+    shopping_list.add_recipes(user, created)
+    return get_outcomes(ids, found, created)
+
+
+@transaction.atomic
+def subscribe(user, ids):
+    lock_user(user)
+    found = find(User.objects.exclude(pk=user.pk), ids,
+                 Subscription.objects.filter(subscriber=user,
+                                             author=OuterRef('pk')))
+    created = [pk for pk, linked in found.items() if not linked]
+    Subscription.objects.bulk_create(
+        [Subscription(subscriber=user, author_id=pk) for pk in created],
+        ignore_conflicts=True)
+    increment(User, created, 'subscribers_count')
+    if created:
+        transaction.on_commit(
+            partial(invalidate_subscription_feeds, [user.id]))
+    return get_outcomes(ids, found, created, {user.id: SELF})
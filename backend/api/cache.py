@@ -0,0 +1,184 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import EmptyResultSet
+from django.utils.connection import ConnectionProxy
+
+FEED_GENERATION_KEY = 'recipe-feed:generation'
+# Версия в ключе меняется вместе с форматом закэшированного ответа.
+RECIPE_PAYLOAD_KEY = 'recipe-payload:2:{}'
+SUBSCRIPTION_FEED_KEY = 'subscription-feed:{}'
+# Рецепт недавно изменён: параллельный запрос мог отрисовать его до
+# изменения, а реплика может ещё отдавать старую версию.
+RECIPE_DIRTY_KEY = 'recipe-payload-dirty:{}'
+
+payload_cache = ConnectionProxy(caches, 'recipe_payloads')
+
+
+def get_feed_generation():
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        cache.add(FEED_GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(FEED_GENERATION_KEY, 1)
+    return generation
+
+
+async def aget_feed_generation():
+    generation = await cache.aget(FEED_GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(FEED_GENERATION_KEY, 1, timeout=None)
+        generation = await cache.aget(FEED_GENERATION_KEY, 1)
+    return generation
+
+
+def bump_feed_generation():
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        cache.set(FEED_GENERATION_KEY, 1, timeout=None)
+
+
+def get_feed_digest(request):
+    params = sorted(
+        (name, sorted(value for value in values if value))
+        for name, values in request.GET.lists()
+    )
+    return hashlib.md5(
+        repr((request.get_host(), request.path, params)).encode()
+    ).hexdigest()
+
+
+def get_feed_cache_key(request, generation=None):
+    if generation is None:
+        generation = get_feed_generation()
+    digest = get_feed_digest(request)
+    return f'recipe-feed:{generation}:{digest}', f'"{generation}-{digest}"'
+
+
+def get_cached_feed(request, render):
+    key, etag = get_feed_cache_key(request)
+    if etag in request.headers.get('If-None-Match', ''):
+        return None, etag
+    data = cache.get(key)
+    if data is None:
+        data = render()
+        cache.set(key, data, settings.RECIPE_FEED_CACHE_TIMEOUT)
+    return data, etag
+
+
+async def aget_cached_feed(request, render):
+    key, etag = get_feed_cache_key(request, await aget_feed_generation())
+    if etag in request.headers.get('If-None-Match', ''):
+        return None, etag
+    data = await cache.aget(key)
+    if data is None:
+        data = await render()
+        await cache.aset(key, data, settings.RECIPE_FEED_CACHE_TIMEOUT)
+    return data, etag
+
+
+def get_cached_subscription_feed(request, paginate):
+    """Первая страница ленты подписок пользователя: id рецептов и
+    ссылка на следующую страницу для каждого набора параметров."""
+    key = SUBSCRIPTION_FEED_KEY.format(request.user.id)
+    digest = get_feed_digest(request)
+    pages = cache.get(key) or {}
+    if digest not in pages:
+        pages[digest] = paginate()
+        cache.set(key, pages, settings.SUBSCRIPTION_FEED_CACHE_TIMEOUT)
+    return pages[digest]
+
+
+def invalidate_subscription_feeds(user_ids):
+    cache.delete_many([SUBSCRIPTION_FEED_KEY.format(user_id)
+                       for user_id in user_ids])
+
+
+def get_count_cache_key(queryset, generation):
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return None
+    digest = hashlib.md5(sql.encode()).hexdigest()
+    return f'recipe-feed:count:{generation}:{queryset.db}:{digest}'
+
+
+def get_cached_count(queryset):
+    key = get_count_cache_key(queryset, get_feed_generation())
+    if key is None:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def aget_cached_count(queryset):
+    key = get_count_cache_key(queryset, await aget_feed_generation())
+    if key is None:
+        return 0
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_payload_keys(recipes):
+    return {recipe.id: RECIPE_PAYLOAD_KEY.format(recipe.id)
+            for recipe in recipes}
+
+
+def get_dirty_keys(recipe_ids):
+    return [RECIPE_DIRTY_KEY.format(recipe_id) for recipe_id in recipe_ids]
+
+
+def get_cacheable(payloads, dirty):
+    """Недавно изменённые рецепты не кэшируются: отрисованная до
+    изменения или прочитанная с реплики старая версия не должна пережить
+    инвалидацию."""
+    return {recipe_id: payload for recipe_id, payload in payloads.items()
+            if RECIPE_DIRTY_KEY.format(recipe_id) not in dirty}
+
+
+def get_recipe_payloads(recipes, render):
+    keys = get_payload_keys(recipes)
+    cached = payload_cache.get_many(keys.values())
+    payloads = {recipe_id: cached[key] for recipe_id, key in keys.items()
+                if key in cached}
+    missing = [recipe for recipe in recipes if recipe.id not in payloads]
+    if missing:
+        rendered = render(missing)
+        dirty = payload_cache.get_many(get_dirty_keys(rendered))
+        payload_cache.set_many({keys[recipe_id]: payload
+                                for recipe_id, payload
+                                in get_cacheable(rendered, dirty).items()},
+                               settings.RECIPE_PAYLOAD_CACHE_TIMEOUT)
+        payloads.update(rendered)
+    return payloads
+
+
+async def aget_recipe_payloads(recipes, render):
+    keys = get_payload_keys(recipes)
+    cached = await payload_cache.aget_many(keys.values())
+    payloads = {recipe_id: cached[key] for recipe_id, key in keys.items()
+                if key in cached}
+    missing = [recipe for recipe in recipes if recipe.id not in payloads]
+    if missing:
+        rendered = await render(missing)
+        dirty = await payload_cache.aget_many(get_dirty_keys(rendered))
+        await payload_cache.aset_many(
+            {keys[recipe_id]: payload for recipe_id, payload
+             in get_cacheable(rendered, dirty).items()},
+            settings.RECIPE_PAYLOAD_CACHE_TIMEOUT)
+        payloads.update(rendered)
+    return payloads
+
+
+def invalidate_recipe_payloads(recipe_ids):
+    payload_cache.delete_many([RECIPE_PAYLOAD_KEY.format(recipe_id)
+                               for recipe_id in recipe_ids])
+    payload_cache.set_many(dict.fromkeys(get_dirty_keys(recipe_ids), True),
+                           settings.REPLICA_PIN_SECONDS)
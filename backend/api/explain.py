@@ -0,0 +1,73 @@
+"""Планы запросов, которые выполняют эндпоинты API.
+
+Сценарии берутся из api.benchmark: каждый выполняется один раз, для
+его SELECT/UPDATE/DELETE строится EXPLAIN, и полные просмотры таблиц
+без индекса попадают в отчёт.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.benchmark import consume, get_scenarios
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+FULL_SCAN = {
+    'sqlite': re.compile(
+        r'^SCAN (?!.* USING (?:COVERING )?INDEX|.* VIRTUAL TABLE)(\S+)'),
+    'postgresql': re.compile(r'Seq Scan on (\S+)'),
+}
+# Промежуточные результаты SQLite: их просмотр — не просмотр таблицы.
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)')
+
+
+def get_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        rows = cursor.fetchall()
+    # SQLite возвращает (id, parent, notused, detail), PostgreSQL — строки.
+    return [row[-1] for row in rows]
+
+
+def get_full_scans(plan, allowed=()):
+    pattern = FULL_SCAN.get(connection.vendor)
+    if pattern is None:
+        return []
+    lines = [line.strip() for line in plan]
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, lines)
+                  if match}
+    subqueries.update(f'({name})' for name in list(subqueries))
+    scans = []
+    for line in lines:
+        match = pattern.search(line)
+        if match and match.group(1) not in subqueries | set(allowed):
+            scans.append(line)
+    return scans
+
+
+def explain_scenario(client, name, request):
+    with CaptureQueriesContext(connection) as context:
+        consume(request(client, 0))
+    statements = []
+    for query in context.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS) and (
+                sql not in statements):
+            statements.append(sql)
+    allowed = settings.EXPLAIN_ALLOWED_SCANS.get(name, ())
+    return [(sql, plan, get_full_scans(plan, allowed))
+            for sql, plan in ((sql, get_plan(sql)) for sql in statements)]
+
+
+def explain(user):
+    """[(сценарий, [(sql, план, полные просмотры), ...]), ...]"""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return [(name, explain_scenario(client, name, request))
+            for name, request in get_scenarios(user, repeat=1)]
@@ -1,7 +1,28 @@
+from django.db.models import F
 from django_filters import rest_framework as d_filters
 
+from api.search import search_recipes
 from recipes.models import Ingredient, Recipe, Tag
 
+# Сортировки ленты: popular и trending читаются из RecipeScore по его
+# индексам, поэтому аннотируются под своими именами — по ним же
+# строится курсор в RecipeCursorPagination.
+RECIPE_ORDERINGS = {
+    'popular': ('-popular', '-id'),
+    'trending': ('-trending', '-id'),
+    'cooking_time': ('cooking_time', '-id'),
+}
+SCORE_ORDERINGS = ('popular', 'trending')
+
+
+# Фильтры по избранному и списку покупок текущего пользователя. Их
+# записи не меняют поколение ленты, поэтому такие счётчики не кэшируются.
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def is_filtered_by_user(request):
+    return any(request.query_params.get(name) for name in USER_FILTERS)
+
 
 class RecipeFilter(d_filters.FilterSet):
     tags = d_filters.filters.ModelMultipleChoiceFilter(
@@ -15,19 +36,37 @@ class RecipeFilter(d_filters.FilterSet):
         method='get_in_cart',
         field_name='is_in_shopping_cart',
     )
+    search = d_filters.CharFilter(method='get_search')
+    ordering = d_filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = ('author',
                   'tags',
                   'is_favorited',
-                  'is_in_shopping_cart')
+                  'is_in_shopping_cart',
+                  'search',
+                  'ordering')
 
     def get_in_cart(self, queryset, name, value):
         if value:
             return queryset.filter(shoppingcart__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        if value in SCORE_ORDERINGS:
+            # Внутреннее соединение даёт планировщику начать с индекса
+            # RecipeScore вместо сортировки рецептов.
+            queryset = queryset.filter(score__isnull=False).annotate(
+                **{value: F(f'score__{value}')})
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     def get_is_favorited(self, queryset, name, value):
         if value:
             return queryset.filter(favorite__user=self.request.user)
@@ -0,0 +1,165 @@
+import abc
+import bisect
+import threading
+import time
+from array import array
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from recipes.models import Ingredient, RecipeIngredient
+
+
+class LazyIndex(abc.ABC):
+    """Индекс в памяти процесса, который строится при первом обращении.
+
+    Сигналы сбрасывают индекс только в своём процессе, поэтому он
+    дополнительно перестраивается по истечении INGREDIENT_INDEX_TTL.
+    Перестраивает индекс один поток: остальные тем временем отдают
+    прежний снимок, а без снимка ждут окончания построения.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._generation = 0
+        self._entries = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries = None
+
+    def _is_expired(self):
+        ttl = (settings.INGREDIENT_INDEX_TTL if self.ttl is None
+               else self.ttl)
+        return time.monotonic() - self._built_at > ttl
+
+    def _get_entries(self):
+        entries = self._entries
+        if entries is not None and not self._is_expired():
+            return entries
+        if not self._build_lock.acquire(blocking=entries is None):
+            return entries
+        try:
+            entries = self._entries
+            if entries is not None and not self._is_expired():
+                return entries
+            with self._lock:
+                generation = self._generation
+            entries = self._build()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries = entries
+                    self._built_at = time.monotonic()
+            return entries
+        finally:
+            self._build_lock.release()
+
+    async def _aget_entries(self):
+        entries = self._entries
+        if entries is not None and not self._is_expired():
+            return entries
+        return await sync_to_async(self._get_entries)()
+
+    @abc.abstractmethod
+    def _build(self):
+        """Строит индекс из базы."""
+
+
+class IngredientIndex(LazyIndex):
+    """Ингредиенты, отсортированные по casefold-названию.
+
+    Префиксный поиск выполняется двумя bisect по списку ключей, затем
+    добавляются совпадения по подстроке.
+    """
+
+    def _build(self):
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        return ([row[0] for row in rows],
+                [{'id': pk, 'name': name, 'measurement_unit': unit}
+                 for _, pk, name, unit in rows])
+
+    def search(self, query, limit=None):
+        return self._search(self._get_entries(), query, limit)
+
+    async def asearch(self, query, limit=None):
+        return self._search(await self._aget_entries(), query, limit)
+
+    def _search(self, entries, query, limit):
+        keys, items = entries
+        query = query.casefold()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_right(keys, query + '\U0010ffff', lo=start)
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        contains = sorted(
+            (key.find(query), key, index)
+            for index, key in enumerate(keys)
+            if not start <= index < end and query in key
+        )
+        result += [items[index] for _, _, index in contains]
+        return result if limit is None else result[:limit]
+
+
+class RecipeIngredientIndex(LazyIndex):
+    """Инвертированный индекс: ингредиент -> отсортированный массив id
+    рецептов, плюс состав каждого рецепта для подсчёта покрытия."""
+
+    def _build(self):
+        postings, recipes = {}, {}
+        for ingredient_id, recipe_id in RecipeIngredient.objects.values_list(
+                'ingredient_id', 'recipe_id'
+        ).order_by('ingredient_id', 'recipe_id').iterator():
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            recipes.setdefault(recipe_id, []).append(ingredient_id)
+        return postings, recipes
+
+    def _remove(self, postings, recipes, recipe_id):
+        for ingredient_id in recipes.pop(recipe_id, ()):
+            posting = postings[ingredient_id]
+            index = bisect.bisect_left(posting, recipe_id)
+            if index < len(posting) and posting[index] == recipe_id:
+                del posting[index]
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        with self._lock:
+            self._generation += 1
+            if self._entries is None:
+                return
+            postings, recipes = self._entries
+            self._remove(postings, recipes, recipe_id)
+            recipes[recipe_id] = list(ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                posting = postings.setdefault(ingredient_id, array('q'))
+                posting.insert(bisect.bisect_left(posting, recipe_id),
+                               recipe_id)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._generation += 1
+            if self._entries is not None:
+                self._remove(*self._entries, recipe_id)
+
+    def rank(self, ingredient_ids):
+        postings, recipes = self._get_entries()
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(postings.get(ingredient_id, ()))
+        ranked = [(count / len(recipes[recipe_id]), count, recipe_id)
+                  for recipe_id, count in matches.items()
+                  if recipe_id in recipes]
+        ranked.sort(reverse=True)
+        return [(recipe_id, coverage) for coverage, _, recipe_id in ranked]
+
+
+ingredient_index = IngredientIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
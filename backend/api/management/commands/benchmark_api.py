@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from api.authentication import token_cache
+from api.benchmark import (check_budgets, compare_async, mirror_replicas,
+                           run, seed)
+
+
+class Command(BaseCommand):
+    help = ('Наполняет тестовую базу данными и замеряет количество '
+            'SQL-запросов, задержку и пиковую память эндпоинтов API')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'recipes', 'management',
+                                 'commands', 'ingredients.json'))
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument(
+            '--compare-async', action='store_true',
+            help='Сравнить пропускную способность sync- и async-чтения')
+        parser.add_argument('--throughput-requests', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Потоков синхронного воркера')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Одновременных запросов к async-воркеру')
+        parser.add_argument('--client-delay', type=float, default=50,
+                            help='Задержка медленного клиента, мс')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        test_database = connection.creation.create_test_db(verbosity=0)
+        mirror_replicas()
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                # Изображения нарезаются сразу после коммита, чтобы фоновые
+                # потоки не писали в тестовую базу во время замеров.
+                with override_settings(MEDIA_ROOT=media_root,
+                                       IMAGE_VARIANT_WORKERS=0):
+                    try:
+                        user = seed(options['ingredients'],
+                                    options['recipes'], options['users'])
+                        results = run(user, options['repeat'])
+                    except RuntimeError as error:
+                        raise CommandError(error)
+                    throughput = []
+                    if options['compare_async']:
+                        throughput = compare_async(
+                            user, options['throughput_requests'],
+                            options['threads'], options['concurrency'],
+                            options['client_delay'] / 1000)
+        finally:
+            connection.creation.destroy_test_db(test_database, verbosity=0)
+            teardown_test_environment()
+        for result in results:
+            self.stdout.write(
+                '{name:<32} queries={queries:<4} p50={p50_ms:<8} '
+                'p99={p99_ms:<8} peak_kb={peak_kb}'.format(**result))
+        self.stdout.write(
+            'auth-token-cache                 hits={hits:<6} '
+            'misses={misses:<6} size={size}'.format(**token_cache.stats()))
+        for result in throughput:
+            self.stdout.write(
+                '{name:<32} sync_rps={sync_rps:<8} async_rps={async_rps:<8} '
+                'speedup={speedup}'.format(**result))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results + throughput, file, ensure_ascii=False,
+                          indent=2)
+        errors = check_budgets(results, settings.API_BENCHMARK_BUDGETS)
+        if errors:
+            raise CommandError('Превышен бюджет:\n' + '\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Бюджеты соблюдены'))
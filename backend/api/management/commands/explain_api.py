@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmark import mirror_replicas, seed
+from api.explain import explain
+
+
+class Command(BaseCommand):
+    help = ('Наполняет тестовую базу, выполняет сценарии benchmark_api и '
+            'показывает EXPLAIN их запросов, отмечая полные просмотры '
+            'таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'recipes', 'management',
+                                 'commands', 'ingredients.json'))
+        parser.add_argument('--plans', action='store_true',
+                            help='Печатать планы всех запросов')
+        parser.add_argument('--strict', action='store_true',
+                            help='Завершиться с ошибкой при полных '
+                                 'просмотрах')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        test_database = connection.creation.create_test_db(verbosity=0)
+        mirror_replicas()
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root,
+                                       IMAGE_VARIANT_WORKERS=0):
+                    user = seed(options['ingredients'], options['recipes'],
+                                options['users'])
+                    report = explain(user)
+        finally:
+            connection.creation.destroy_test_db(test_database, verbosity=0)
+            teardown_test_environment()
+        flagged = 0
+        for name, statements in report:
+            scans = sum(len(full_scans) for _, _, full_scans in statements)
+            flagged += scans
+            style = self.style.WARNING if scans else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name:<32} запросов={len(statements):<4} '
+                f'полных просмотров={scans}'))
+            for sql, plan, full_scans in statements:
+                if not (full_scans or options['plans']):
+                    continue
+                self.stdout.write(f'    {sql}')
+                for line in plan:
+                    self.stdout.write(f'        {line}')
+        if flagged and options['strict']:
+            raise CommandError(f'Полных просмотров таблиц: {flagged}')
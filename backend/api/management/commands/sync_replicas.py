@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в файлы реплик из '
+            'DATABASE_REPLICAS — замена репликации для локальной проверки')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте '
+                               'DATABASE_REPLICAS')
+        connection.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.ensure_connection()
+            connection.connection.backup(replica.connection)
+            self.stdout.write(f'{alias}: {replica.settings_dict["NAME"]}')
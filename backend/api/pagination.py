@@ -1,5 +1,113 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage, Paginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+
+from api.cache import aget_cached_count, get_cached_count
+from api.filters import RECIPE_ORDERINGS, is_filtered_by_user
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return get_cached_count(self.object_list)
+
+
+class CachedCountPageNumberPagination(LimitPageNumberPagination):
+    django_paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if is_filtered_by_user(request):
+            self.django_paginator_class = Paginator
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        paginator = Paginator(queryset, self.get_page_size(request))
+        paginator.count = await (
+            queryset.acount() if is_filtered_by_user(request)
+            else aget_cached_count(queryset))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list.aiterator()]
+        self.request = request
+        return self.page.object_list
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+    count_query_param = 'count'
+
+    def get_count(self, queryset):
+        return get_cached_count(queryset)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = (queryset.count() if is_filtered_by_user(request)
+                          else self.get_count(queryset))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = OrderedDict(count=self.count, **response.data)
+        return response
+
+
+class RecipeCursorPagination(LimitCursorPagination):
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        return RECIPE_ORDERINGS.get(
+            request.query_params.get(self.ordering_query_param),
+            self.ordering)
+
+
+class UserCursorPagination(LimitCursorPagination):
+    ordering = ('id',)
+
+    def get_count(self, queryset):
+        return queryset.count()
+
+
+class OptionalCursorPagination(BasePagination):
+    page_number_class = LimitPageNumberPagination
+    cursor_class = LimitCursorPagination
+    pagination_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        return (request.query_params.get(self.pagination_query_param)
+                == 'cursor'
+                or self.cursor_class.cursor_query_param
+                in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        paginator_class = (self.cursor_class if self.use_cursor(request)
+                           else self.page_number_class)
+        self.paginator = paginator_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+
+class RecipePagination(OptionalCursorPagination):
+    page_number_class = CachedCountPageNumberPagination
+    cursor_class = RecipeCursorPagination
+
+
+class UserPagination(OptionalCursorPagination):
+    cursor_class = UserCursorPagination
@@ -0,0 +1,292 @@
+import base64
+import binascii
+import io
+import json
+import re
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import JSONParser
+
+CHUNK_SIZE = 64 * 1024
+DATA_URL_PREFIX = b'data:'
+DATA_URL_HEADER = re.compile(rb'data:image/[\w.+-]+;base64')
+DATA_URL_HEADER_MAX = 100
+SNIFF_SIZE = 256 * 1024
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+ESCAPES = {b'/': b'/', b'n': b'', b'r': b'', b't': b''}
+WHITESPACE = b' \t\r\n'
+JSON_SPECIAL = re.compile(rb'["{}\[\]:]')
+STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+def get_extension(head):
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class Base64ImageDecoder:
+    """Декодирует base64 по частям во временный файл.
+
+    Принимается data URL (data:image/...;base64,...) и, как раньше
+    в Base64ImageField, base64 без заголовка.
+
+    Формат проверяется по сигнатуре, размеры — по заголовку изображения,
+    пока декодировано не больше SNIFF_SIZE байт; слишком большие файлы
+    отклоняются, не дочитываясь до конца.
+    """
+
+    def __init__(self, max_size, max_side):
+        self.max_size = max_size
+        self.max_side = max_side
+        self.header = b''
+        self.tail = b''
+        self.head = b''
+        self.extension = None
+        self.checked = False
+        self.padded = False
+        self.file = None
+
+    def error(self, message='Загрузите корректное изображение.'):
+        if self.file is not None:
+            self.file.close()
+        return ValidationError({'image': [message]})
+
+    def feed(self, data):
+        if self.file is None:
+            self.header += data
+            data = self.strip_header()
+            if data is None:
+                return
+            self.file = TemporaryUploadedFile('image', None, 0, None)
+        data = self.tail + data.translate(None, WHITESPACE)
+        usable = len(data) // 4 * 4
+        self.tail = data[usable:]
+        if usable:
+            self.write(data[:usable])
+
+    def strip_header(self):
+        """Отрезает заголовок data URL; строка без него считается чистым
+        base64. None — заголовок ещё не дочитан."""
+        if not self.header.startswith(DATA_URL_PREFIX):
+            if DATA_URL_PREFIX.startswith(self.header):
+                return None
+            return self.header
+        comma = self.header.find(b',')
+        if comma == -1:
+            if len(self.header) > DATA_URL_HEADER_MAX:
+                raise self.error()
+            return None
+        if not DATA_URL_HEADER.fullmatch(self.header[:comma]):
+            raise self.error()
+        return self.header[comma + 1:]
+
+    def write(self, data):
+        if self.padded:
+            raise self.error()
+        self.padded = data.endswith(b'=')
+        try:
+            decoded = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            raise self.error()
+        self.file.size += len(decoded)
+        if self.file.size > self.max_size:
+            raise self.error(f'Размер изображения превышает '
+                             f'{self.max_size / 1024 ** 2:.3g} МБ.')
+        self.file.write(decoded)
+        if not self.checked:
+            self.head += decoded
+            self.check()
+
+    def check(self, final=False):
+        if self.extension is None and len(self.head) >= 12:
+            self.extension = get_extension(self.head)
+            if self.extension is None:
+                raise self.error('Неподдерживаемый формат изображения.')
+        side_error = (f'Сторона изображения не должна превышать '
+                      f'{self.max_side} пикселей.')
+        try:
+            with Image.open(io.BytesIO(self.head)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            raise self.error(side_error)
+        except (OSError, SyntaxError, ValueError):
+            if final or len(self.head) >= SNIFF_SIZE:
+                raise self.error()
+            return
+        if max(width, height) > self.max_side:
+            raise self.error(side_error)
+        self.checked = True
+        self.head = b''
+
+    def finish(self):
+        if self.file is None or self.tail:
+            raise self.error()
+        if not self.checked:
+            self.check(final=True)
+        if self.extension is None:
+            raise self.error('Неподдерживаемый формат изображения.')
+        self.file.name = f'{uuid.uuid4()}.{self.extension}'
+        self.file.seek(0)
+        return self.file
+
+
+class RecipeJSONParser(JSONParser):
+    """JSONParser, который не держит в памяти base64-строку поля image.
+
+    Тело читается частями; строка image верхнего уровня уходит в
+    Base64ImageDecoder, а остальной JSON разбирается обычным json.loads.
+    """
+
+    image_field = b'image'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        decoder = Base64ImageDecoder(settings.RECIPE_IMAGE_MAX_SIZE,
+                                     settings.RECIPE_IMAGE_MAX_SIDE)
+        scanner = JSONImageScanner(self.image_field, decoder)
+        for chunk in iter(partial(stream.read, CHUNK_SIZE), b''):
+            scanner.feed(chunk)
+        text = scanner.finish()
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+        if not scanner.has_image:
+            return data
+        image = decoder.finish()
+        if not isinstance(data, dict):
+            image.close()
+            return data
+        name = self.image_field.decode()
+        data[name] = image
+        request = (parser_context or {}).get('request')
+        if request is not None:
+            # Как DRF для форм: Django закрывает файлы из FILES вместе с
+            # запросом, и временный файл не переживает его.
+            request._request._files = MultiValueDict({name: [image]})
+        return data
+
+
+class JSONImageScanner:
+    """Копирует JSON в буфер, вырезая значение одного строкового ключа
+    верхнего уровня и передавая его содержимое в decoder."""
+
+    def __init__(self, key, decoder):
+        self.key = key
+        self.decoder = decoder
+        self.max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        self.buffer = bytearray()
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string = None
+        self.value_key = None
+        self.in_image = False
+        self.has_image = False
+
+    def feed(self, chunk):
+        position = 0
+        while position < len(chunk):
+            if self.in_image:
+                position = self.feed_image(chunk, position)
+            else:
+                position = self.feed_json(chunk, position)
+        if self.max_size is not None and len(self.buffer) > self.max_size:
+            raise ParseError('Тело запроса слишком большое.')
+
+    def feed_image(self, chunk, position):
+        end = chunk.find(b'"', position)
+        data = bytes(chunk[position:len(chunk) if end == -1 else end])
+        if self.escape:
+            data = b'\\' + data
+            self.escape = False
+        if data.endswith(b'\\') and end == -1:
+            data, self.escape = data[:-1], True
+        if b'\\' in data:
+            parts = data.split(b'\\')
+            try:
+                data = parts[0] + b''.join(
+                    ESCAPES[part[:1]] + part[1:] for part in parts[1:])
+            except KeyError:
+                raise self.decoder.error()
+        self.decoder.feed(data)
+        if end == -1:
+            return len(chunk)
+        self.in_image = False
+        return end + 1
+
+    def feed_json(self, chunk, position):
+        """Копирует JSON целыми отрезками: между кавычками, скобками и
+        двоеточиями разбирать по байту нечего."""
+        while position < len(chunk):
+            if self.in_string:
+                position = self.feed_string(chunk, position)
+                continue
+            match = JSON_SPECIAL.search(chunk, position)
+            end = len(chunk) if match is None else match.start()
+            if chunk[position:end].strip(WHITESPACE):
+                self.value_key = None
+            self.buffer += chunk[position:end]
+            if match is None:
+                return end
+            char = match.group()
+            position = end + 1
+            if char == b'"' and self.depth == 1 and self.value_key == (
+                    self.key):
+                self.buffer += b'null'
+                self.in_image = self.has_image = True
+                self.value_key = None
+                return position
+            self.buffer += char
+            if self.depth == 1 and char == b':':
+                self.value_key = self.last_string
+                continue
+            self.value_key = None
+            if char == b'"':
+                self.in_string = True
+                self.string_start = len(self.buffer)
+            elif char in b'{[':
+                self.depth += 1
+            elif char in b'}]':
+                self.depth -= 1
+        return position
+
+    def feed_string(self, chunk, position):
+        if self.escape:
+            self.buffer += chunk[position:position + 1]
+            self.escape = False
+            return position + 1
+        match = STRING_SPECIAL.search(chunk, position)
+        end = len(chunk) if match is None else match.end()
+        self.buffer += chunk[position:end]
+        if match is None:
+            return end
+        if match.group() == b'\\':
+            self.escape = True
+        else:
+            self.in_string = False
+            self.last_string = bytes(self.buffer[self.string_start:-1])
+        return end
+
+    def finish(self):
+        if self.in_image:
+            raise ParseError('JSON parse error - строка image не закрыта')
+        try:
+            return self.buffer.decode()
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
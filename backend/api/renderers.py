@@ -0,0 +1,13 @@
+from rest_framework import renderers
+
+from backend import performance
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer, время которого performance_middleware относит
+    к сериализации."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with performance.timed_serialization():
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
@@ -0,0 +1,105 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import (Case, Exists, FloatField, Func, Lookup,
+                              OuterRef, Q, Value, When)
+
+from recipes.models import Recipe, RecipeIngredient, RecipeSearchEntry
+
+FTS_TABLE = RecipeSearchEntry._meta.db_table
+WORD_RE = re.compile(r'\w+')
+
+
+class Match(Lookup):
+    """search_entry__document__match: MATCH по FTS5-таблице."""
+
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class BM25(Func):
+    """Ранг FTS5: чем меньше, тем релевантнее; weights — веса столбцов."""
+
+    function = 'bm25'
+    output_field = FloatField()
+
+    def __init__(self, document, weights):
+        super().__init__(document, *(Value(weight) for weight in weights))
+
+
+RecipeSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+class FallbackSearchBackend:
+    def filter(self, queryset, query):
+        words = WORD_RE.findall(query)
+        if not words:
+            return queryset.none()
+        condition = Q()
+        for word in words:
+            condition &= Q(Exists(Recipe.objects.filter(
+                Q(name__icontains=word) | Q(text__icontains=word)
+                | Q(ingredients__name__icontains=word),
+                id=OuterRef('id'))))
+        return queryset.filter(condition).annotate(
+            search_rank=Case(When(name__icontains=words[0], then=0),
+                             default=1)
+        ).order_by('search_rank', '-pub_date')
+
+    def index(self, recipe_ids):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+
+class SQLiteSearchBackend:
+    weights = (10.0, 1.0, 5.0)
+
+    def filter(self, queryset, query):
+        words = WORD_RE.findall(query)
+        if not words:
+            return queryset.none()
+        return queryset.filter(
+            search_entry__document__match=' '.join(
+                f'"{word}"*' for word in words)
+        ).annotate(
+            search_rank=BM25('search_entry__document', weights=self.weights)
+        ).order_by('search_rank')
+
+    def index(self, recipe_ids):
+        recipes = Recipe.objects.filter(id__in=recipe_ids).values_list(
+            'id', 'name', 'text')
+        ingredients = {}
+        for recipe_id, name in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values_list('recipe_id',
+                                                      'ingredient__name'):
+            ingredients.setdefault(recipe_id, []).append(name)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [(recipe_id,) for recipe_id in recipe_ids])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+                'VALUES (%s, %s, %s, %s)',
+                [(recipe_id, name, text,
+                  ' '.join(ingredients.get(recipe_id, [])))
+                 for recipe_id, name, text in recipes])
+
+    def remove(self, recipe_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [(recipe_id,) for recipe_id in recipe_ids])
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    return FallbackSearchBackend()
+
+
+def search_recipes(queryset, query):
+    return get_search_backend().filter(queryset, query)
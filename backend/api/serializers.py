@@ -1,4 +1,9 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
@@ -6,13 +11,18 @@ from rest_framework.validators import UniqueTogetherValidator
 
 from users.models import Subscription, User
 
-from backend.constants import (MAX_AMOUNT_CONST,
-                               MAX_COOKING_TIME_CONST,
-                               MIN_AMOUNT_CONST,
-                               MIN_COOKING_TIME_CONST
-                               )
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from api.bulk import lock_user
+from api.cache import get_recipe_payloads
+from api.indexes import recipe_ingredient_index
+from api.utils import get_limit, get_recipe_flags
+
+from recipes import shopping_list
+from recipes.counters import increment
+from recipes.images import get_srcset
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+from backend.constants import (MAX_AMOUNT_CONST, MAX_COOKING_TIME_CONST,
+                               MIN_AMOUNT_CONST, MIN_COOKING_TIME_CONST)
 
 
 class UserSerializer(UserSerializer):
@@ -61,17 +71,38 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             context=self.context
         ).data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        lock_user(validated_data['subscriber'])
+        subscription = super().create(validated_data)
+        increment(User, [subscription.author_id], 'subscribers_count')
+        return subscription
+
     def validate(self, data):
         if data['subscriber'] == data['author']:
             raise serializers.ValidationError(
                 'Нельзя подписаться на самого себя'
             )
+        # Ответ обрезается по recipes_limit: ошибку в нём нужно отдать
+        # до того, как подписка сохранится.
+        get_limit(self.context['request'], 'recipes_limit')
         return data
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
 class SubscriptionPresentSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + (
@@ -79,42 +110,22 @@ class SubscriptionPresentSerializer(UserSerializer):
             'recipes_count'
         )
 
-    def get_recipes_count(self, object):
-        return object.recipes.count()
-
     def get_recipes(self, object):
-        author_recipes = self.recipes_limit(object.recipes.all())
+        if hasattr(object, 'limited_recipes'):
+            author_recipes = object.limited_recipes
+        else:
+            author_recipes = self.recipes_limit(object.recipes.all())
         return RecipePresentSerializer(
             author_recipes, many=True
         ).data
 
     def recipes_limit(self, queryset):
-        limit = self.context['request'].query_params.get('recipes_limit')
-        if limit:
-            return queryset[:int(limit)]
+        limit = get_limit(self.context['request'], 'recipes_limit')
+        if limit is not None:
+            return queryset[:limit]
         return queryset
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-
-    class Meta:
-        model = Favorite
-        fields = ('user',
-                  'recipe')
-        validators = [UniqueTogetherValidator(
-                      queryset=Favorite.objects.all(),
-                      fields=('user', 'recipe'),
-                      message='Рецепт уже добавлен в избраное')
-                      ]
-
-    def to_representation(self, instance):
-        return RecipePresentSerializer(
-            instance.recipe
-        ).data
-
-
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -124,23 +135,6 @@ class TagSerializer(serializers.ModelSerializer):
                   'slug')
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-        validators = [UniqueTogetherValidator(
-                      queryset=ShoppingCart.objects.all(),
-                      fields=('user', 'recipe'),
-                      message='Рецепт уже добавлен в список покупок')
-                      ]
-
-    def to_representation(self, instance):
-        return RecipePresentSerializer(instance.recipe).data
-
-
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -188,16 +182,52 @@ class RecipePresentSerializer(serializers.ModelSerializer):
                   'cooking_time')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        self.context['recipe_flags'] = get_recipe_flags(
+            request and request.user, recipes)
+        payloads = get_recipe_payloads(recipes, render_recipe_payloads)
+        return [self.child.merge_flags(payloads[recipe.id], recipe)
+                for recipe in recipes]
+
+
+class RecipePayloadSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         many=True, read_only=True, source='recipeingredient_set')
-    is_in_shopping_cart = serializers.BooleanField(default=False)
-    is_favorited = serializers.BooleanField(default=False)
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
+        fields = ('id',
+                  'tags',
+                  'author',
+                  'name',
+                  'ingredients',
+                  'image',
+                  'image_srcset',
+                  'text',
+                  'cooking_time')
+
+    def get_image_srcset(self, recipe):
+        return get_srcset(recipe.image_variants)
+
+
+def render_recipe_payloads(recipes):
+    prefetch_related_objects(recipes, 'tags',
+                             'recipeingredient_set__ingredient')
+    return {payload['id']: payload for payload in
+            RecipePayloadSerializer(recipes, many=True).data}
+
+
+class RecipeSerializer(RecipePayloadSerializer):
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+
+    class Meta(RecipePayloadSerializer.Meta):
         fields = ('id',
                   'tags',
                   'author',
@@ -206,18 +236,67 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'is_favorited',
                   'is_in_shopping_cart',
                   'image',
+                  'image_srcset',
                   'text',
                   'cooking_time')
+        list_serializer_class = RecipeListSerializer
+
+    def get_flags(self, recipe):
+        flags = self.context.get('recipe_flags', {})
+        if recipe.id not in flags:
+            request = self.context.get('request')
+            flags.update(get_recipe_flags(request and request.user,
+                                          [recipe]))
+            self.context['recipe_flags'] = flags
+        return flags[recipe.id]
+
+    def get_is_favorited(self, recipe):
+        return self.get_flags(recipe)['is_favorited']
+
+    def get_is_in_shopping_cart(self, recipe):
+        return self.get_flags(recipe)['is_in_shopping_cart']
+
+    def merge_flags(self, payload, recipe):
+        flags = self.get_flags(recipe)
+        request = self.context.get('request')
+        data = dict(payload,
+                    author=dict(payload['author'],
+                                is_subscribed=flags['is_subscribed']),
+                    is_favorited=flags['is_favorited'],
+                    is_in_shopping_cart=flags['is_in_shopping_cart'])
+        build_uri = (request.build_absolute_uri if request is not None
+                     else str)
+        if data['image']:
+            data['image'] = build_uri(data['image'])
+        data['image_srcset'] = {
+            image_format: ', '.join(f'{build_uri(url)} {width}w'
+                                    for url, width in candidates)
+            for image_format, candidates in data['image_srcset'].items()}
+        return {name: data[name] for name in self.Meta.fields}
+
+    def to_representation(self, recipe):
+        payloads = get_recipe_payloads([recipe], render_recipe_payloads)
+        return self.merge_flags(payloads[recipe.id], recipe)
+
 
-    # def get_is_in_shopping_cart(self, object):
-    #     request = self.context.get('request')
-    #     return (request and request.user.is_authenticated
-    #             and object.recipe.filter(user=request.user).exists())
+def get_amounts(array_of_ingredients):
+    return {ingredient['id'].id: ingredient['amount']
+            for ingredient in array_of_ingredients}
+
+
+class RecipeImageField(Base64ImageField):
+    """Принимает base64-строку или файл, уже декодированный
+    RecipeJSONParser."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = CreateRecipeIngredientSerializer(many=True)
-    image = Base64ImageField(use_url=True, max_length=None)
+    image = RecipeImageField(use_url=True, max_length=None)
     author = UserSerializer(read_only=True)
     tags = serializers.PrimaryKeyRelatedField(many=True,
                                               queryset=Tag.objects.all())
@@ -234,7 +313,9 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                   'author')
 
     def validate(self, data):
-        if not (MIN_COOKING_TIME_CONST <= data['cooking_time']
+        cooking_time = data.get('cooking_time')
+        if cooking_time is not None and not (
+                MIN_COOKING_TIME_CONST <= cooking_time
                 <= MAX_COOKING_TIME_CONST):
             raise serializers.ValidationError(
                 'Значение времени приготовления должно'
@@ -243,17 +324,52 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return data
 
     def make_ingredients_list(self, array_of_ingredients, recipe):
-        recipe.ingredients.clear()
-        ingredients_list = []
-        for ingredient_data in array_of_ingredients:
-            ingredients_list.append(
-                recipe.ingredients.through(
-                    recipe=recipe,
-                    ingredient=ingredient_data['id'],
-                    amount=ingredient_data['amount']
-                )
-            )
-        recipe.ingredients.through.objects.bulk_create(ingredients_list)
+        amounts = get_amounts(array_of_ingredients)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items())
+        transaction.on_commit(partial(
+            recipe_ingredient_index.update_recipe, recipe.id, list(amounts)))
+
+    def update_ingredients_list(self, array_of_ingredients, recipe):
+        """Меняет только отличающиеся строки RecipeIngredient и
+        возвращает прежние и новые количества оставшихся ингредиентов.
+
+        bulk_create и bulk_update не шлют post_save, поэтому кэш и
+        поисковый индекс рецепта сбрасывает сохранение самого рецепта
+        в update. Удалённые строки списки покупок вычитают сами через
+        сигнал pre_delete.
+        """
+        rows = {ingredient_id: (pk, amount)
+                for pk, ingredient_id, amount
+                in RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                    'id', 'ingredient_id', 'amount')}
+        old_amounts = {ingredient_id: amount
+                       for ingredient_id, (_, amount) in rows.items()}
+        new_amounts = get_amounts(array_of_ingredients)
+        removed = [rows[ingredient_id][0] for ingredient_id
+                   in old_amounts.keys() - new_amounts.keys()]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        RecipeIngredient.objects.bulk_update(
+            [RecipeIngredient(id=rows[ingredient_id][0], amount=amount)
+             for ingredient_id, amount in new_amounts.items()
+             if old_amounts.get(ingredient_id, amount) != amount],
+            ['amount'])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in old_amounts)
+        if old_amounts.keys() != new_amounts.keys():
+            transaction.on_commit(partial(
+                recipe_ingredient_index.update_recipe, recipe.id,
+                list(new_amounts)))
+        return ({ingredient_id: amount
+                 for ingredient_id, amount in old_amounts.items()
+                 if ingredient_id in new_amounts},
+                new_amounts)
 
     def validate_ingredients(self, ingredients):
         array_of_ingredients = []
@@ -274,22 +390,22 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         validated_array_of_ingredients = val_data.pop('ingredients')
         author = self.context.get('request').user
         recipe = Recipe.objects.create(author=author, **validated_data)
+        increment(User, [author.id], 'recipes_count')
         recipe.tags.set(validated_tags_data)
         self.make_ingredients_list(validated_array_of_ingredients, recipe)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        val_data = validated_data
-        try:
-            validated_tags_data = val_data.pop('tags')
-            array_of_ingredients = val_data.pop('ingredients')
+        validated_tags_data = validated_data.pop('tags', None)
+        array_of_ingredients = validated_data.pop('ingredients', None)
+        if validated_tags_data is not None:
             instance.tags.set(validated_tags_data)
-            self.make_ingredients_list(array_of_ingredients, instance)
-            return super().update(instance, validated_data)
-        except KeyError:
-            raise serializers.ValidationError(
-                'У рецепта должен быть хотя бы один тэг и ингридиент')
+        if array_of_ingredients is not None:
+            shopping_list.change_recipe(
+                instance, *self.update_ingredients_list(
+                    array_of_ingredients, instance))
+        return super().update(instance, validated_data)
 
     def validate_tags(self, tags):
         if len(tags) != len(set(tags)):
@@ -307,4 +423,4 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return image
 
     def to_representation(self, recipe):
-        return RecipeSerializer(recipe).data
+        return RecipeSerializer(recipe, context=self.context).data
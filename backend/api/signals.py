@@ -0,0 +1,235 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.cache import (bump_feed_generation, invalidate_recipe_payloads,
+                       invalidate_subscription_feeds)
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.search import get_search_backend
+from recipes import images, shopping_list
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            RecipeScore, ShoppingCart, Tag)
+from recipes.scores import scores_refreshed
+from users.models import Subscription, User
+
+from backend import performance
+
+USER_PAYLOAD_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def invalidate_recipes(recipe_ids, reindex=True):
+    transaction.on_commit(partial(invalidate_recipe_payloads, recipe_ids))
+    transaction.on_commit(bump_feed_generation)
+    if reindex:
+        transaction.on_commit(
+            partial(get_search_backend().index, recipe_ids))
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    performance.instrument_connection(connection)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipe_ingredient_index(**kwargs):
+    recipe_ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        invalidate_recipes(list(instance.recipes.values_list('id',
+                                                             flat=True)))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    invalidate_recipes([instance.id])
+    if images.needs_variants(instance):
+        images.schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        RecipeScore.objects.create(recipe=instance)
+
+
+def invalidate_author_feeds(author_id):
+    invalidate_subscription_feeds(Subscription.objects.filter(
+        author_id=author_id).values_list('subscriber_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_subscriber_feeds(instance, created=True, **kwargs):
+    if created:
+        transaction.on_commit(
+            partial(invalidate_author_feeds, instance.author_id))
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_subscriber_feed(instance, **kwargs):
+    transaction.on_commit(
+        partial(invalidate_subscription_feeds, [instance.subscriber_id]))
+
+
+@receiver(scores_refreshed, sender=RecipeScore)
+def invalidate_scored_feed(**kwargs):
+    bump_feed_generation()
+
+
+@receiver(images.variants_ready, sender=Recipe)
+def invalidate_recipe_image(recipe_id, **kwargs):
+    invalidate_recipes([recipe_id], reindex=False)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe(instance, **kwargs):
+    invalidate_recipes([instance.id], reindex=False)
+    get_search_backend().remove([instance.id])
+    transaction.on_commit(
+        partial(recipe_ingredient_index.remove_recipe, instance.id))
+    transaction.on_commit(
+        partial(images.delete_variants, instance.image_variants))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def invalidate_recipe_ingredient(instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_deleted_recipe_ingredient(instance, **kwargs):
+    invalidate_recipes([instance.recipe_id], reindex=False)
+
+
+def is_cascade(origin, model):
+    """Удаление пришло каскадом от объекта другой модели."""
+    if origin is None:
+        return False
+    if isinstance(origin, QuerySet):
+        return not issubclass(origin.model, model)
+    return not isinstance(origin, model)
+
+
+def remember_row(instance, fields):
+    """Сохраняет на экземпляре значения полей строки до изменения."""
+    instance._previous_row = None
+    if instance.pk is not None:
+        instance._previous_row = type(instance).objects.filter(
+            pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_shopping_lists(instance, **kwargs):
+    # В том числе каскадом от удаления автора: строки корзины и состав
+    # рецепта после этого уходят молча, см. is_cascade ниже.
+    shopping_list.delete_recipe(instance)
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def remember_cart_row(instance, raw=False, **kwargs):
+    if not raw:
+        remember_row(instance, ('user_id', 'recipe_id'))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_recipe_to_shopping_list(instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_row', None)
+    current = (instance.user_id, instance.recipe_id)
+    if previous == current:
+        return
+    if previous is not None:
+        shopping_list.remove_recipe(*previous)
+    shopping_list.add_recipe(*current)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_cart_recipe_from_shopping_list(instance, origin=None, **kwargs):
+    # При удалении рецепта его уже вычел приёмник Recipe, при удалении
+    # пользователя каскадом уходит и сам список покупок.
+    if not is_cascade(origin, ShoppingCart):
+        shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient_row(instance, raw=False, **kwargs):
+    if not raw:
+        remember_row(instance, ('recipe_id', 'ingredient_id', 'amount'))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists_amount(instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_row', None)
+    new_amounts = {instance.ingredient_id: instance.amount}
+    if previous is None:
+        shopping_list.change_recipe(instance.recipe_id, {}, new_amounts)
+        return
+    recipe_id, ingredient_id, amount = previous
+    if recipe_id == instance.recipe_id:
+        shopping_list.change_recipe(recipe_id, {ingredient_id: amount},
+                                    new_amounts)
+    else:
+        shopping_list.change_recipe(recipe_id, {ingredient_id: amount}, {})
+        shopping_list.change_recipe(instance.recipe_id, {}, new_amounts)
+
+
+@receiver(pre_delete, sender=RecipeIngredient)
+def subtract_shopping_lists_amount(instance, origin=None, **kwargs):
+    if not is_cascade(origin, RecipeIngredient):
+        shopping_list.change_recipe(
+            instance.recipe_id, {instance.ingredient_id: instance.amount},
+            {})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        invalidate_recipes(list(instance.recipes.values_list('id',
+                                                             flat=True)),
+                           reindex=False)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_recipes([instance.id] if not reverse else pk_set or [],
+                           reindex=False)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_tag_recipes(instance, **kwargs):
+    invalidate_recipes(list(instance.recipes.values_list('id', flat=True)),
+                       reindex=False)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(instance, **kwargs):
+    transaction.on_commit(partial(token_cache.invalidate, instance.key))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user(instance, **kwargs):
+    transaction.on_commit(partial(token_cache.invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None
+                   and not USER_PAYLOAD_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes(list(instance.recipes.values_list('id', flat=True)),
+                       reindex=False)
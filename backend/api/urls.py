@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api import async_views
+from api.async_views import async_read_view
+
+from .views import (IngredientViewSet, PerformanceView, RecipeViewSet,
+                    TagViewSet, UserViewSet)
 
 router = routers.DefaultRouter()
 router.register('users', UserViewSet, basename='users')
@@ -9,8 +14,33 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('tags', TagViewSet, basename='tags')
 
+async_urlpatterns = [
+    path('recipes/', async_read_view(
+        async_views.recipe_list,
+        RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))),
+    path('recipes/<int:pk>/', async_read_view(
+        async_views.recipe_detail,
+        RecipeViewSet.as_view({'get': 'retrieve',
+                               'put': 'update',
+                               'patch': 'partial_update',
+                               'delete': 'destroy'}))),
+    path('ingredients/', async_read_view(
+        async_views.ingredient_list,
+        IngredientViewSet.as_view({'get': 'list'}))),
+    path('ingredients/<int:pk>/', async_read_view(
+        async_views.ingredient_detail,
+        IngredientViewSet.as_view({'get': 'retrieve'}))),
+    path('tags/', async_read_view(
+        async_views.tag_list, TagViewSet.as_view({'get': 'list'}))),
+    path('tags/<int:pk>/', async_read_view(
+        async_views.tag_detail, TagViewSet.as_view({'get': 'retrieve'}))),
+]
 
 urlpatterns = [
+    path('performance/', PerformanceView.as_view(), name='performance'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken'))
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
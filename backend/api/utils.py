@@ -1,15 +1,165 @@
 import csv
+import itertools
+import tempfile
 
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import ValidationError
 
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
 
-def download_csv(queryset):
-    response = HttpResponse(
-        content_type="text/csv",
+SHOPPING_LIST_FIELDS = ('ingredient__name',
+                        'ingredient__measurement_unit',
+                        'ingredient_value')
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_txt(rows):
+    yield 'Список покупок\n\n'
+    for name, measurement_unit, amount in rows:
+        yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT))
+    return PDF_FONT_NAME
+
+
+def iter_pdf(rows):
+    with tempfile.TemporaryFile() as file:
+        document = canvas.Canvas(file, pagesize=A4)
+        font = get_pdf_font()
+        _, height = A4
+        y = height - PDF_MARGIN
+        document.setFont(font, PDF_FONT_SIZE + 4)
+        document.drawString(PDF_MARGIN, y, 'Список покупок')
+        y -= PDF_FONT_SIZE * 3
+        document.setFont(font, PDF_FONT_SIZE)
+        for name, measurement_unit, amount in rows:
+            if y < PDF_MARGIN:
+                document.showPage()
+                document.setFont(font, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            document.drawString(PDF_MARGIN, y,
+                                f'{name} ({measurement_unit}) — {amount}')
+            y -= PDF_FONT_SIZE * 1.5
+        document.save()
+        file.seek(0)
+        yield from iter(lambda: file.read(STREAM_CHUNK_SIZE), b'')
+
+
+def read_chunk(parts):
+    chunk = bytearray()
+    for part in parts:
+        chunk += part
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            break
+    return bytes(chunk)
+
+
+class ShoppingListResponse(StreamingHttpResponse):
+    """Под ASGI StreamingHttpResponse читает синхронный генератор целиком
+    в список; здесь он читается в потоке порциями по STREAM_CHUNK_SIZE,
+    и каждая порция сразу уходит клиенту. Под WSGI отдаётся как обычно."""
+
+    async def __aiter__(self):
+        parts = iter(self.streaming_content)
+        while chunk := await sync_to_async(read_chunk)(parts):
+            yield chunk
+
+
+SHOPPING_LIST_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', iter_csv),
+    'txt': ('text/plain; charset=utf-8', iter_txt),
+    'pdf': ('application/pdf', iter_pdf),
+}
+
+
+def download_shopping_list(rows, file_format='csv'):
+    if file_format not in SHOPPING_LIST_FORMATS:
+        raise ValidationError(
+            'Доступные форматы: ' + ', '.join(SHOPPING_LIST_FORMATS))
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        raise ValidationError('Корзина пуста')
+    content_type, render = SHOPPING_LIST_FORMATS[file_format]
+    return ShoppingListResponse(
+        render(itertools.chain([first_row], rows)),
+        content_type=content_type,
         headers={'Content-Disposition':
-                 'attachment; filename="shopping_list.csv"'},
+                 f'attachment; filename="shopping_list.{file_format}"'},
     )
-    writer = csv.DictWriter(response, fieldnames=queryset.first().keys())
-    writer.writeheader()
-    writer.writerows(queryset)
-    return response
+
+
+def get_limit(request, param='limit'):
+    limit = request.query_params.get(param)
+    if limit and not limit.isdecimal():
+        raise ValidationError(
+            f'{param} должен быть неотрицательным целым числом')
+    return int(limit) if limit else None
+
+
+def get_flag_querysets(user, recipe_ids, author_ids):
+    return (
+        Favorite.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True),
+        ShoppingCart.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True),
+        Subscription.objects.filter(
+            subscriber=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True),
+    )
+
+
+def build_recipe_flags(recipes, favorited=(), in_cart=(), subscribed=()):
+    return {recipe.id: {'is_favorited': recipe.id in favorited,
+                        'is_in_shopping_cart': recipe.id in in_cart,
+                        'is_subscribed': recipe.author_id in subscribed}
+            for recipe in recipes}
+
+
+def get_recipe_flags(user, recipes):
+    if not (user and user.is_authenticated and recipes):
+        return build_recipe_flags(recipes)
+    querysets = get_flag_querysets(
+        user, [recipe.id for recipe in recipes],
+        {recipe.author_id for recipe in recipes})
+    return build_recipe_flags(recipes, *map(set, querysets))
+
+
+async def aget_recipe_flags(user, recipes):
+    if not (user and user.is_authenticated and recipes):
+        return build_recipe_flags(recipes)
+    querysets = get_flag_querysets(
+        user, [recipe.id for recipe in recipes],
+        {recipe.author_id for recipe in recipes})
+    values = []
+    for queryset in querysets:
+        values.append({value async for value in queryset.aiterator()})
+    return build_recipe_flags(recipes, *values)
@@ -1,37 +1,100 @@
-from django.db.models import Exists, OuterRef, Sum
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from api import bulk
+from api.authentication import token_cache
+from api.cache import get_cached_feed, get_cached_subscription_feed
 from api.filters import IngredientFilter, RecipeFilter
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.parsers import RecipeJSONParser
+from api.pagination import (LimitCursorPagination,
+                            LimitPageNumberPagination, RecipePagination,
+                            UserPagination)
 from api.permissions import AuthorOrReadOnly
-from api.serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeSerializer,
-                             ShoppingCartSerializer,
-                             SubscriptionPresentSerializer,
+from api.serializers import (BulkIdsSerializer, CreateRecipeSerializer,
+                             IngredientSerializer, RecipePresentSerializer,
+                             RecipeSerializer, SubscriptionPresentSerializer,
                              SubscriptionSerializer, TagSerializer,
                              UserSerializer)
-from api.utils import download_csv
-from recipes.models import (Favorite,
-                            Ingredient,
-                            Recipe,
-                            RecipeIngredient,
-                            ShoppingCart,
-                            Tag)
+from api.utils import download_shopping_list, get_limit
+from recipes.counters import increment
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.scores import update_scores
 from users.models import Subscription, User
 
+from backend import performance
+
+
+def get_bulk_ids(request):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def link_recipe(model, request, pk, message, on_create):
+    """Добавляет рецепт в избранное или список покупок.
+
+    Пользователь берётся из запроса, рецепт читается один раз и сразу
+    отдаётся в ответе, а повтор отсекает ограничение unique_recipe_*
+    в базе вместо отдельной проверки. Строка пользователя блокируется,
+    как в пакетном добавлении, чтобы оно не посчитало эту запись своей.
+    """
+    recipe = get_object_or_404(
+        Recipe.objects.only(*RecipePresentSerializer.Meta.fields), pk=pk)
+    try:
+        with transaction.atomic():
+            bulk.lock_user(request.user)
+            model.objects.create(user=request.user, recipe=recipe)
+            on_create(recipe)
+    except IntegrityError:
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]})
+    return Response(performance.get_data(RecipePresentSerializer(recipe)),
+                    status=status.HTTP_201_CREATED)
+
+
+def unlink_recipe(model, request, pk, message):
+    """Удаляет рецепт из избранного или списка покупок и возвращает
+    удалённую запись: по её времени добавления из тренда вычитается
+    ровно её вклад."""
+    item = model.objects.filter(user=request.user, recipe_id=pk).first()
+    if item is None or not item.delete()[0]:
+        get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        raise ValidationError(message)
+    return item
+
+
+def add_to_cart(recipe):
+    increment(Recipe, [recipe.id], 'cart_count')
+    update_scores('cart', [recipe.id])
+
+
+def add_favorite(recipe):
+    increment(Recipe, [recipe.id], 'favorites_count')
+    update_scores('favorite', [recipe.id])
+
 
 class UserViewSet(UserViewSet):
     serializer_class = UserSerializer
+    pagination_class = UserPagination
 
     def get_queryset(self):
         user = self.request.user
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().order_by('id')
         if user.is_authenticated:
             return queryset.annotate(
                 is_subscribed=Exists(
@@ -61,16 +124,30 @@ class UserViewSet(UserViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(
-                serializer.data, status=status.HTTP_201_CREATED
+                performance.get_data(serializer),
+                status=status.HTTP_201_CREATED
             )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='subscribe',
+        url_name='subscribe_bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def bulk_subscribe(self, request):
+        return Response({'results': bulk.subscribe(
+            request.user, get_bulk_ids(request))})
+
     @to_subscribe.mapping.delete
+    @transaction.atomic
     def delete_subscription(self, request, id):
         author = get_object_or_404(User, id=id)
         subscription = get_object_or_404(Subscription.objects.filter(
                                          subscriber=request.user,
                                          author=author))
         subscription.delete()
+        increment(User, [author.id], 'subscribers_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -80,12 +157,24 @@ class UserViewSet(UserViewSet):
         url_name='subscriptions'
     )
     def get_subscription_list(self, request):
-        authors = User.objects.filter(author__subscriber=request.user)
-        return self.get_paginated_response(self.get_serializer(
-            self.paginate_queryset(queryset=authors), many=True).data)
+        recipes = Recipe.objects.all()
+        limit = get_limit(request, 'recipes_limit')
+        if limit is not None:
+            recipes = recipes[:limit]
+        authors = (
+            User.objects.filter(author__subscriber=request.user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .prefetch_related(Prefetch('recipes', queryset=recipes,
+                                       to_attr='limited_recipes'))
+            .order_by('id')
+        )
+        return self.get_paginated_response(performance.get_data(
+            self.get_serializer(self.paginate_queryset(queryset=authors),
+                                many=True)))
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+    read_from_replica = True
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -94,8 +183,15 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     permission_classes = (AllowAny, )
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name, get_limit(request)))
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    read_from_replica = True
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
@@ -103,38 +199,40 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
+    read_from_replica = True
     serializer_class = RecipeSerializer
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly, AuthorOrReadOnly
     )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    parser_classes = (RecipeJSONParser, FormParser, MultiPartParser)
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_authenticated:
-            return (Recipe.objects.all().select_related('author')
-                    .annotate(is_favorited=Exists(
-                        Favorite.objects.filter(recipe=OuterRef('pk'))
-                        .select_related('user')
-                    ))
-                    .annotate(is_in_shopping_cart=Exists(ShoppingCart.objects
-                                                         .filter(
-                                                             recipe=OuterRef(
-                                                                 'pk'))
-                                                         .select_related(
-                                                             'user')
-                                                         ))
-                    .prefetch_related('tags', 'ingredients')
-                    )
-        return (Recipe.objects.all().select_related('author')
-                .prefetch_related('tags', 'ingredients'))
+        return Recipe.objects.all().select_related('author')
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return CreateRecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        data, etag = get_cached_feed(
+            request, lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs).data)
+        if data is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        increment(User, [instance.author_id], 'recipes_count', -1)
+
     @action(
         detail=True,
         methods=['post'],
@@ -142,23 +240,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='shopping_cart',
     )
     def get_shopping_cart(self, request, pk):
-        if request.method == 'POST':
-            data = {'user': request.user.id, 'recipe': pk}
-            serializer = ShoppingCartSerializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED
-            )
+        return link_recipe(
+            ShoppingCart, request, pk, 'Рецепт уже добавлен в список покупок',
+            add_to_cart)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart',
+        url_name='shopping_cart_bulk',
+    )
+    def bulk_shopping_cart(self, request):
+        return Response({'results': bulk.add_to_cart(
+            request.user, get_bulk_ids(request))})
 
     @get_shopping_cart.mapping.delete
+    @transaction.atomic
     def delete_shopping_cart(self, request, pk):
-        queryset = ShoppingCartSerializer.Meta.model.objects.filter(
-            user=request.user,
-            recipe=get_object_or_404(Recipe, pk=pk))
-        count, _ = queryset.delete()
-        if not count:
-            raise ValidationError('Рецепт не в корзине')
+        item = unlink_recipe(ShoppingCart, request, pk, 'Рецепт не в корзине')
+        increment(Recipe, [item.recipe_id], 'cart_count', -1)
+        update_scores('cart', [item.recipe_id], -1, item.created)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -168,25 +269,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='favorite',
     )
     def get_favorite(self, request, pk):
-        if request.method == 'POST':
-            data = {'user': request.user.id, 'recipe': pk}
-            serializer = FavoriteSerializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED
-            )
+        return link_recipe(
+            Favorite, request, pk, 'Рецепт уже добавлен в избраное',
+            add_favorite)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite',
+        url_name='favorite_bulk',
+    )
+    def bulk_favorite(self, request):
+        return Response({'results': bulk.add_favorites(
+            request.user, get_bulk_ids(request))})
 
     @get_favorite.mapping.delete
+    @transaction.atomic
     def delete_favorite(self, request, pk):
-        queryset = FavoriteSerializer.Meta.model.objects.filter(
-            user=request.user,
-            recipe=get_object_or_404(Recipe, pk=pk))
-        count, _ = queryset.delete()
-        if not count:
-            raise ValidationError('Рецепт не в избранном')
+        item = unlink_recipe(Favorite, request, pk, 'Рецепт не в избранном')
+        increment(Recipe, [item.recipe_id], 'favorites_count', -1)
+        update_scores('favorite', [item.recipe_id], -1, item.created)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='what_can_i_cook',
+        url_name='what_can_i_cook',
+    )
+    def what_can_i_cook(self, request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            }
+        except ValueError:
+            raise ValidationError('Укажите id ингредиентов через запятую')
+        if not ingredient_ids:
+            raise ValidationError('Укажите хотя бы один ингредиент')
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(
+            recipe_ingredient_index.rank(ingredient_ids), request, self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page])
+        page = [(recipes[recipe_id], coverage) for recipe_id, coverage in page
+                if recipe_id in recipes]
+        data = performance.get_data(self.get_serializer(
+            [recipe for recipe, _ in page], many=True))
+        for recipe_data, (_, coverage) in zip(data, page):
+            recipe_data['coverage'] = round(coverage, 4)
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='feed',
+        url_name='feed',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def feed(self, request):
+        paginator = LimitCursorPagination()
+        recipes = self.get_queryset().filter(
+            author__in=Subscription.objects.filter(
+                subscriber=request.user).values('author'))
+        if paginator.cursor_query_param in request.query_params:
+            page = paginator.paginate_queryset(recipes, request, self)
+            return paginator.get_paginated_response(
+                performance.get_data(self.get_serializer(page, many=True)))
+        first_page = []
+
+        def paginate():
+            first_page.extend(paginator.paginate_queryset(
+                recipes, request, self))
+            return {'ids': [recipe.id for recipe in first_page],
+                    'next': paginator.get_next_link()}
+
+        cached = get_cached_subscription_feed(request, paginate)
+        if not first_page:
+            recipes = self.get_queryset().in_bulk(cached['ids'])
+            first_page = [recipes[recipe_id] for recipe_id in cached['ids']
+                          if recipe_id in recipes]
+        return Response(OrderedDict([
+            ('next', cached['next']),
+            ('previous', None),
+            ('results', performance.get_data(
+                self.get_serializer(first_page, many=True))),
+        ]))
+
     @action(
         detail=False,
         methods=['get'],
@@ -194,17 +364,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        user = request.user
         ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcart__user=user
-            ).values(
+            ShoppingListItem.objects.filter(
+                user=request.user, total_amount__gt=0
+            ).values_list(
                 'ingredient__name',
                 'ingredient__measurement_unit',
-            ).annotate(ingredient_value=Sum('amount')
-                       ).order_by('ingredient__name')
+                'total_amount',
+            ).order_by('ingredient__name')
         )
-        if not ingredients.exists():
-            raise ValidationError('Корзина пуста')
-        response = download_csv(ingredients)
-        return response
+        return download_shopping_list(
+            ingredients.iterator(),
+            request.query_params.get('format', 'csv'))
+
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+
+class PerformanceView(APIView):
+    """Гистограммы замеров performance_middleware по действиям за
+    последние PERFORMANCE_HISTOGRAM_SIZE запросов этого процесса."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.PERFORMANCE_SAMPLE_RATE,
+            'actions': performance.histograms.snapshot(),
+            'auth_token_cache': token_cache.stats(),
+        })
@@ -0,0 +1,23 @@
+import itertools
+
+from django.core.cache.backends import filebased
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """FileBasedCache, общий для воркеров gunicorn в одном контейнере.
+
+    Стандартный бэкенд перед каждой записью перечисляет все файлы
+    каталога, чтобы решить, пора ли вытеснять. Здесь это делается раз в
+    CULL_CHECK_EVERY записей, поэтому MAX_ENTRIES может ненадолго
+    превышаться на это число записей в каждом потоке.
+    """
+
+    CULL_CHECK_EVERY = 100
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._writes = itertools.count()
+
+    def _cull(self):
+        if next(self._writes) % self.CULL_CHECK_EVERY == 0:
+            super()._cull()
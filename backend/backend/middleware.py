@@ -0,0 +1,112 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+from backend import performance
+from backend.routers import choose_replica, read_database
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'pin_primary'
+
+
+def get_pin_key(request):
+    """Маркер недавней записи привязан к токену или сессии клиента."""
+    credentials = (request.headers.get('Authorization')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    digest = hashlib.md5(credentials.encode()).hexdigest()
+    return f'pin-primary:{digest}'
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    key = get_pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def get_read_database(request):
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return None
+    try:
+        view = resolve(request.path_info).func
+    except Resolver404:
+        return None
+    view_class = getattr(view, 'cls', None)
+    if not getattr(view_class, 'read_from_replica', False):
+        return None
+    if is_pinned(request):
+        return None
+    return choose_replica()
+
+
+def pin_primary(request, response):
+    """После успешной записи чтения клиента какое-то время идут в
+    default, чтобы он увидел свои изменения раньше, чем их получит
+    реплика."""
+    if (not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS
+            or response.status_code >= 400):
+        return
+    timeout = settings.REPLICA_PIN_SECONDS
+    response.set_cookie(PIN_COOKIE, '1', max_age=timeout, httponly=True,
+                        samesite='Lax')
+    key = get_pin_key(request)
+    if key is not None:
+        cache.set(key, True, timeout)
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = read_database.set(get_read_database(request))
+            try:
+                response = await get_response(request)
+            finally:
+                read_database.reset(token)
+            pin_primary(request, response)
+            return response
+    else:
+        def middleware(request):
+            token = read_database.set(get_read_database(request))
+            try:
+                response = get_response(request)
+            finally:
+                read_database.reset(token)
+            pin_primary(request, response)
+            return response
+    return middleware
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    """Замеряет долю запросов PERFORMANCE_SAMPLE_RATE: Server-Timing в
+    ответе, JSON-строка в логгер performance и гистограммы процесса."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not performance.is_sampled():
+                return await get_response(request)
+            stats = performance.RequestStats()
+            token = performance.current_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                performance.current_stats.reset(token)
+            return performance.finish(stats, request, response)
+    else:
+        def middleware(request):
+            if not performance.is_sampled():
+                return get_response(request)
+            stats = performance.RequestStats()
+            token = performance.current_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                performance.current_stats.reset(token)
+            return performance.finish(stats, request, response)
+    return middleware
@@ -0,0 +1,186 @@
+"""Замеры запросов для performance_middleware.
+
+Для выбранных запросов считаются общее время, время и число SQL-запросов,
+повторы одинаковых запросов, время сериализации и размер ответа.
+Сериализацией считаются рендеринг JSON (api.renderers.JSONRenderer) и
+участки представлений, явно обёрнутые в timed_serialization/get_data.
+Замер текущего запроса лежит в ContextVar, поэтому его видят и потоки
+sync_to_async у async-представлений. Гистограммы живут в памяти
+процесса: у каждого воркера свои.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+
+logger = logging.getLogger('performance')
+
+current_stats = ContextVar('current_stats', default=None)
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+METRICS = ('wall_ms', 'db_ms', 'serializer_ms', 'queries',
+           'duplicate_queries', 'response_bytes')
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = Counter()
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def add_query(self, sql, params, duration):
+        self.db_time += duration
+        self.queries[sql, str(params)] += 1
+
+    def get_record(self, request, response):
+        queries = sum(self.queries.values())
+        record = {
+            'action': get_action(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'wall_ms': round((time.perf_counter() - self.start) * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+            'queries': queries,
+            'duplicate_queries': queries - len(self.queries),
+            'response_bytes': (None if response.streaming
+                               else len(response.content)),
+        }
+        if record['duplicate_queries']:
+            (sql, _), _ = self.queries.most_common(1)[0]
+            record['duplicate_sql'] = sql[:200]
+        return record
+
+
+def get_action(request):
+    """RecipeViewSet.list, RecipeViewSet.download_shopping_cart и т. п.;
+    для представлений не из вьюсетов — имя маршрута."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+def is_sampled():
+    return random.random() < settings.PERFORMANCE_SAMPLE_RATE
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, params, time.perf_counter() - start)
+
+
+def instrument_connection(connection):
+    # В начало списка: connection.execute_wrapper() снимает свою обёртку
+    # через pop() и не должен задеть эту.
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+@contextmanager
+def timed_serialization():
+    """Относит время блока к сериализации текущего замера; вложенные
+    блоки входят во внешний."""
+    stats = current_stats.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        stats.serializer_time += time.perf_counter() - start
+
+
+def get_data(serializer):
+    with timed_serialization():
+        return serializer.data
+
+
+def get_server_timing(record):
+    return (f'total;dur={record["wall_ms"]}, '
+            f'db;dur={record["db_ms"]};desc="{record["queries"]} queries, '
+            f'{record["duplicate_queries"]} duplicates", '
+            f'serializer;dur={record["serializer_ms"]}')
+
+
+def finish(stats, request, response):
+    record = stats.get_record(request, response)
+    response['Server-Timing'] = get_server_timing(record)
+    logger.info(json.dumps(record, ensure_ascii=False))
+    histograms.add(record)
+    return response
+
+
+def get_percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(samples):
+    summary = {'count': len(samples)}
+    for index, metric in enumerate(METRICS):
+        values = sorted(sample[index] for sample in samples
+                        if sample[index] is not None)
+        if not values:
+            continue
+        summary[metric] = {name: get_percentile(values, fraction)
+                           for name, fraction in PERCENTILES}
+        summary[metric]['max'] = values[-1]
+    buckets = [0] * (len(BUCKETS_MS) + 1)
+    for sample in samples:
+        buckets[bisect_left(BUCKETS_MS, sample[0])] += 1
+    summary['wall_ms_histogram'] = dict(zip(
+        [str(bound) for bound in BUCKETS_MS] + ['+Inf'], buckets))
+    return summary
+
+
+class Histograms:
+    """Последние size замеров каждого действия."""
+
+    def __init__(self, size):
+        self.samples = defaultdict(partial(deque, maxlen=size))
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.samples[record['action']].append(
+                tuple(record[metric] for metric in METRICS))
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        with self.lock:
+            samples = {action: list(action_samples)
+                       for action, action_samples in self.samples.items()}
+        return {action: summarize(action_samples)
+                for action, action_samples in sorted(samples.items())}
+
+
+histograms = Histograms(settings.PERFORMANCE_HISTOGRAM_SIZE)
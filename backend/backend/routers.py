@@ -0,0 +1,39 @@
+"""Чтение с реплик для вьюсетов с read_from_replica = True.
+
+replica_middleware решает, можно ли обслужить запрос с реплики, и
+кладёт её alias в read_database; ReplicaRouter отправляет туда чтения,
+а запись и все остальные запросы — в default.
+
+Токены и пользователи всегда читаются с default: запрос на вход не
+несёт заголовка Authorization, к которому привязан маркер записи, и
+только что выданного токена на реплике может ещё не быть.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+read_database = ContextVar('read_database', default=None)
+
+PRIMARY_APP_LABELS = ('auth', 'authtoken')
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label in PRIMARY_APP_LABELS
+                or model._meta.label == settings.AUTH_USER_MODEL):
+            return 'default'
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
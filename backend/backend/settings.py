@@ -1,4 +1,5 @@
 import os
+from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -32,7 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.performance_middleware',
     'django.middleware.security.SecurityMiddleware',
+    'backend.middleware.replica_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,6 +71,20 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: имена баз через запятую, остальные параметры
+# берутся из default. Локально это копии SQLite-файла, которые обновляет
+# `manage.py sync_replicas`. Чтения рецептов, ингредиентов и тегов идут
+# на реплику, если клиент не писал последние REPLICA_PIN_SECONDS секунд.
+DATABASE_REPLICAS = []
+for index, name in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], NAME=name.strip(),
+                            TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -105,11 +122,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachingTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
     'PAGE_SIZE': 6,
 }
@@ -132,3 +153,158 @@ CSRF_TRUSTED_ORIGINS = ['https://*.foodgram-oleffr.hopto.org']
 CORS_ORIGIN_WHITELIST = (
     'https://*.foodgram-oleffr.hopto.org'
 )
+# LocMemCache живёт в памяти одного процесса и годится для разработки;
+# Dockerfile по умолчанию включает backend.caches.FileBasedCache, общий
+# для воркеров. Данные рецептов лежат в отдельном кэше, чтобы ленты и
+# счётчики не вытесняли их; MAX_ENTRIES - с запасом на весь каталог.
+cache_backend = os.getenv('CACHE_BACKEND',
+                          'django.core.cache.backends.locmem.LocMemCache')
+cache_location = os.getenv('CACHE_LOCATION', 'foodgram')
+CACHES = {
+    'default': {
+        'BACKEND': cache_backend,
+        'LOCATION': cache_location,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+    'recipe_payloads': {
+        'BACKEND': cache_backend,
+        'LOCATION': f'{cache_location}-recipe-payloads',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('RECIPE_PAYLOAD_CACHE_MAX_ENTRIES', 50000)),
+        },
+    },
+}
+
+RECIPE_FEED_CACHE_TIMEOUT = int(os.getenv('RECIPE_FEED_CACHE_TIMEOUT', 300))
+
+RECIPE_PAYLOAD_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_PAYLOAD_CACHE_TIMEOUT', 24 * 60 * 60))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+
+# Первая страница /api/recipes/feed/ кэшируется на пользователя и
+# сбрасывается, когда авторы из его подписок публикуют рецепты.
+SUBSCRIPTION_FEED_CACHE_TIMEOUT = int(
+    os.getenv('SUBSCRIPTION_FEED_CACHE_TIMEOUT', 30))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+# Наибольшее число id в пакетных запросах избранного, списка покупок и
+# подписок.
+BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 100))
+
+# LRU токенов в памяти процесса: сколько токенов хранить и сколько
+# секунд доверять записи; 0 в AUTH_TOKEN_CACHE_SIZE отключает кэш.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60))
+
+# Доля запросов, которые замеряет performance_middleware (0 - ни одного,
+# 1 - все), и сколько последних замеров каждого действия держать для
+# гистограмм /api/performance/.
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('PERFORMANCE_SAMPLE_RATE', 0))
+PERFORMANCE_HISTOGRAM_SIZE = int(
+    os.getenv('PERFORMANCE_HISTOGRAM_SIZE', 1000))
+
+# Замеры пишутся в логгер performance по одному JSON на строку.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'performance': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Ограничения на изображение рецепта, проверяемые при потоковом
+# декодировании base64 в RecipeJSONParser.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_SIDE = int(os.getenv('RECIPE_IMAGE_MAX_SIDE', 6000))
+
+# Потоков для фоновой нарезки изображений рецептов; 0 - обрабатывать
+# изображение сразу после коммита, в том же потоке.
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# GET рецептов, ингредиентов и тегов обслуживают async-представления
+# из api/async_views.py; запись остаётся за синхронными вьюсетами.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'True') == 'True'
+
+# Рейтинги для ?ordering=popular|trending: вес добавления в избранное и
+# в список покупок, период полураспада тренда в часах и точка отсчёта
+# тренда. Вклад добавления в тренд удваивается с каждым периодом после
+# эпохи; float выдерживает около 1000 периодов (5 лет при 48 часах),
+# поэтому эпоху нужно сдвигать заранее и после сдвига выполнять
+# `manage.py refresh_recipe_scores --full`.
+RECIPE_SCORE_WEIGHTS = {'favorite': 1.0, 'cart': 2.0}
+RECIPE_TRENDING_HALF_LIFE = float(
+    os.getenv('RECIPE_TRENDING_HALF_LIFE', 48))
+RECIPE_TRENDING_EPOCH = datetime.fromisoformat(
+    os.getenv('RECIPE_TRENDING_EPOCH', '2026-01-01T00:00:00+00:00'))
+
+# Полные просмотры, которые `manage.py explain_api` не считает проблемой:
+# справочники отдаются и загружаются в индекс целиком, пользователи —
+# страницами по id.
+EXPLAIN_ALLOWED_SCANS = {
+    'users-list': ('users_user',),
+    'ingredients-list': ('recipes_ingredient',),
+    'ingredients-search': ('recipes_ingredient',),
+    'tags-list': ('recipes_tag',),
+}
+
+# Бюджеты для `manage.py benchmark_api`: queries, p50_ms, p99_ms, peak_kb.
+API_BENCHMARK_BUDGETS = {
+    'users-list': {'queries': 3},
+    'users-retrieve': {'queries': 1},
+    'users-me': {'queries': 1},
+    'users-subscriptions': {'queries': 3},
+    'users-subscribe': {'queries': 10},
+    'users-unsubscribe': {'queries': 6},
+    'users-subscribe-bulk': {'queries': 6},
+    'ingredients-list': {'queries': 1},
+    'ingredients-search': {'queries': 1},
+    'ingredients-retrieve': {'queries': 1},
+    'tags-list': {'queries': 1},
+    'tags-retrieve': {'queries': 1},
+    'recipes-list': {'queries': 8},
+    'recipes-list-deep': {'queries': 9},
+    'recipes-list-cursor': {'queries': 8},
+    'recipes-list-popular': {'queries': 9},
+    'recipes-list-trending-cursor': {'queries': 8},
+    'recipes-feed': {'queries': 7},
+    'recipes-search': {'queries': 8},
+    'recipes-what-can-i-cook': {'queries': 8},
+    'recipes-list-anonymous': {'queries': 4},
+    'recipes-retrieve': {'queries': 4},
+    'recipes-create': {'queries': 26},
+    'recipes-update': {'queries': 22},
+    'recipes-update-amount': {'queries': 22},
+    'recipes-destroy': {'queries': 17},
+    'recipes-favorite': {'queries': 7},
+    'recipes-unfavorite': {'queries': 6},
+    'recipes-shopping-cart': {'queries': 13},
+    'recipes-favorite-bulk': {'queries': 7},
+    'recipes-shopping-cart-bulk': {'queries': 13},
+    'recipes-download-shopping-cart': {'queries': 1},
+    'recipes-remove-shopping-cart': {'queries': 12},
+}
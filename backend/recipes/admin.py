@@ -1,17 +1,18 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'counter_in_favorite',)
+    list_display = ('pk', 'name', 'author', 'counter_in_favorite',
+                    'cart_count',)
     list_filter = ('author', 'name', 'tags')
     search_fields = ('author', 'name',)
 
     def counter_in_favorite(self, object):
-        return object.favorite_set.count()
+        return object.favorites_count
     counter_in_favorite.short_description = 'Количество добавлений в избранное'
 
 
@@ -47,3 +48,9 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe',)
     list_filter = ('user',)
     search_fields = ('user',)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'total_amount',)
+    list_filter = ('user',)
@@ -0,0 +1,48 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# (модель, поле-счётчик, модель строк, FK на модель) для пересчёта.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def increment(model, pks, field, delta=1):
+    """Атомарно меняет счётчик через F(); уменьшение не опускает его
+    ниже нуля, если счётчик уже разошёлся с данными."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def get_actual_count(source, source_field):
+    return Coalesce(Subquery(
+        source.objects.filter(**{source_field: OuterRef('pk')})
+        .order_by().values(source_field)
+        .annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def reconcile(fix=True):
+    """Сравнивает счётчики с COUNT(*) по строкам и при fix исправляет
+    расхождения. Возвращает {'Model.field': число расхождений}."""
+    mismatches = {}
+    for model, field, source, source_field in COUNTERS:
+        actual = get_actual_count(source, source_field)
+        stale = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')})
+        count = stale.count()
+        if count and fix:
+            model.objects.filter(
+                pk__in=Subquery(stale.values('pk'))
+            ).update(**{field: actual})
+        if count:
+            mismatches[f'{model.__name__}.{field}'] = count
+    return mismatches
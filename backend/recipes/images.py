@@ -0,0 +1,129 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SIZES = (('thumbnail', 160), ('card', 480), ('full', 1280))
+VARIANT_DIR = 'recipes/variants'
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+    'AVIF': {'quality': 60},
+}
+
+variants_ready = Signal()
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_VARIANT_WORKERS, 1),
+    thread_name_prefix='image-variants')
+
+
+def get_formats(image):
+    """Современные форматы, которые умеет кодировать Pillow, и
+    JPEG/PNG для браузеров без их поддержки."""
+    Image.init()
+    modern = [name for name in ('AVIF', 'WEBP') if name in Image.SAVE]
+    return modern + ['PNG' if image.mode == 'RGBA' else 'JPEG']
+
+
+def open_source(name):
+    with default_storage.open(name) as file:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = (image.mode in ('RGBA', 'LA', 'PA')
+                         or 'transparency' in image.info)
+            return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def render_variants(name):
+    image = open_source(name)
+    formats = get_formats(image)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    sizes = []
+    for size_name, max_side in VARIANT_SIZES:
+        variant = image.copy()
+        variant.thumbnail((max_side, max_side), Image.LANCZOS)
+        if sizes and sizes[-1]['width'] == variant.width:
+            continue
+        files = {}
+        for image_format in formats:
+            buffer = io.BytesIO()
+            variant.save(buffer, format=image_format,
+                         **SAVE_OPTIONS[image_format])
+            extension = image_format.lower().replace('jpeg', 'jpg')
+            files[image_format.lower()] = default_storage.save(
+                f'{VARIANT_DIR}/{stem}-{size_name}.{extension}',
+                ContentFile(buffer.getvalue()))
+        sizes.append({'name': size_name,
+                      'width': variant.width,
+                      'height': variant.height,
+                      'files': files})
+    return {'source': name, 'sizes': sizes}
+
+
+def delete_variants(variants):
+    for size in variants.get('sizes', ()):
+        for name in size['files'].values():
+            default_storage.delete(name)
+
+
+def generate_variants(recipe_id, name):
+    """Считает варианты изображения и сохраняет их, только если у
+    рецепта всё ещё то же исходное изображение."""
+    try:
+        old_variants = Recipe.objects.filter(pk=recipe_id).values_list(
+            'image_variants', flat=True).first()
+        variants = render_variants(name)
+        if Recipe.objects.filter(pk=recipe_id, image=name).update(
+                image_variants=variants):
+            if old_variants:
+                delete_variants(old_variants)
+            variants_ready.send(sender=Recipe, recipe_id=recipe_id)
+        else:
+            delete_variants(variants)
+    except Exception:
+        logger.exception(f'Не удалось обработать изображение {name}')
+
+
+def run_in_worker(recipe_id, name):
+    close_old_connections()
+    try:
+        generate_variants(recipe_id, name)
+    finally:
+        close_old_connections()
+
+
+def needs_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name)
+
+
+def schedule_variants(recipe):
+    if settings.IMAGE_VARIANT_WORKERS:
+        transaction.on_commit(partial(executor.submit, run_in_worker,
+                                      recipe.id, recipe.image.name))
+    else:
+        transaction.on_commit(partial(generate_variants, recipe.id,
+                                      recipe.image.name))
+
+
+def get_srcset(variants):
+    """{формат: [(url, ширина), ...]} по возрастанию ширины."""
+    srcset = {}
+    for size in variants.get('sizes', ()):
+        for image_format, name in size['files'].items():
+            srcset.setdefault(image_format, []).append(
+                (default_storage.url(name), size['width']))
+    return srcset
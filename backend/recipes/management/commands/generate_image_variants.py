@@ -0,0 +1,34 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import Recipe
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s, %(levelname)s, %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Нарезает уменьшенные копии и WebP/AVIF-версии изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересчитать и уже обработанные рецепты')
+        parser.add_argument('--recipes', nargs='+', type=int,
+                            help='id рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('id', 'image', 'image_variants')
+        if options['recipes']:
+            recipes = recipes.filter(id__in=options['recipes'])
+        processed = 0
+        for recipe in recipes.iterator():
+            if options['force'] or images.needs_variants(recipe):
+                images.generate_variants(recipe.id, recipe.image.name)
+                processed += 1
+        logger.info(f'Обработано изображений: {processed}')
@@ -1,8 +1,12 @@
+import argparse
+import csv
 import json
 import logging
 import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
 
@@ -13,19 +17,90 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer, started = '', False
+    for chunk in iter(lambda: file.read(chunk_size), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while (position < len(buffer)
+                   and (buffer[position].isspace()
+                        or started and buffer[position] == ',')):
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                line, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield line
+        buffer = buffer[position:]
+    raise CommandError('JSON-массив не закрыт или повреждён')
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield {'name': name, 'measurement_unit': measurement_unit}
+
+
+READERS = {'json': iter_json_array, 'csv': iter_csv}
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            f'должно быть не меньше 1, получено {value}')
+    return number
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        logger.info('Импорт начался')
-        try:
-            with open(
-                    os.path.join(os.path.dirname(__file__),
-                                 'ingredients.json'),
-                    'r',
-                    encoding='utf-8') as file:
-                data = json.load(file)
-                Ingredient.objects.bulk_create(Ingredient(**line
-                                                          ) for line in data)
-            logger.info('Данные загружены')
-        except Exception as error:
-            logger.error(error)
+    help = 'Загружает ингредиенты из JSON- или CSV-файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(os.path.dirname(__file__),
+                                 'ingredients.json'))
+        parser.add_argument('--format', choices=READERS,
+                            help='По умолчанию определяется по расширению')
+        parser.add_argument('--batch-size', type=positive_int,
+                            default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        logger.info(f'Импорт из {path} начался')
+        initial_count = Ingredient.objects.count()
+        started, rows = time.monotonic(), 0
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            lines = READERS[file_format](file)
+            while batch := list(islice(lines, options['batch_size'])):
+                Ingredient.objects.bulk_create(
+                    (Ingredient(**line) for line in batch),
+                    ignore_conflicts=True)
+                rows += len(batch)
+                elapsed = time.monotonic() - started
+                logger.info(f'Обработано строк: {rows} '
+                            f'({rows / elapsed:.0f} строк/с)')
+        logger.info(
+            f'Данные загружены: {rows} строк, новых ингредиентов '
+            f'{Ingredient.objects.count() - initial_count}')
@@ -0,0 +1,38 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_list
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s, %(levelname)s, %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает или проверяет агрегированные списки покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Только сравнить с пересчётом с нуля')
+        parser.add_argument('--users', nargs='+', type=int,
+                            help='id пользователей')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if options['verify']:
+            mismatches = shopping_list.verify(users)
+            for (user_id, ingredient_id), (stored, expected) in sorted(
+                    mismatches.items()):
+                logger.warning(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'{stored} вместо {expected}')
+            if mismatches:
+                raise CommandError(f'Расхождений: {len(mismatches)}')
+            logger.info('Списки покупок совпадают')
+            return
+        count = shopping_list.rebuild(users)
+        logger.info(f'Пересчитано позиций: {count}')
@@ -0,0 +1,29 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import reconcile
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s, %(levelname)s, %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного, корзины, рецептов и подписчиков '
+            'с данными и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить, ничего не меняя')
+
+    def handle(self, *args, **options):
+        mismatches = reconcile(fix=not options['check'])
+        for counter, count in mismatches.items():
+            logger.warning(f'{counter}: расхождений {count}')
+        if mismatches and options['check']:
+            raise CommandError('Счётчики расходятся с данными')
+        logger.info('Исправлено' if mismatches else 'Расхождений нет')
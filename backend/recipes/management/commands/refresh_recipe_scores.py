@@ -0,0 +1,32 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from recipes.scores import refresh
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s, %(levelname)s, %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Сбрасывает кэш лент с сортировкой popular и trending, чтобы '
+            'в них попали новые рейтинги; запускается по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Сначала пересчитать рейтинги с нуля по '
+                                 'всем добавлениям, например после сдвига '
+                                 'RECIPE_TRENDING_EPOCH')
+
+    def handle(self, *args, **options):
+        if not options['full']:
+            refresh()
+            logger.info('Кэш лент по рейтингам сброшен')
+            return
+        changed = refresh(full=True)
+        logger.info(f'Рейтинги пересчитаны с нуля, тренд ненулевой у '
+                    f'{changed} рецептов')
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+        "name, text, ingredients, tokenize='unicode61 remove_diacritics 2')")
+    ingredients = {}
+    for recipe_id, name in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient__name').iterator():
+        ingredients.setdefault(recipe_id, []).append(name)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            'VALUES (%s, %s, %s, %s)',
+            [(recipe_id, name, text, ' '.join(ingredients.get(recipe_id, [])))
+             for recipe_id, name, text in Recipe.objects.values_list(
+                 'id', 'name', 'text').iterator()])
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
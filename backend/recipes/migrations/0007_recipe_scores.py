@@ -0,0 +1,73 @@
+# Generated by Django 4.2.6 on 2026-10-17 06:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_scores(apps, schema_editor):
+    """Рейтинги по уже накопленным счётчикам. Всем существующим записям
+    избранного и корзины created проставляется временем миграции,
+    поэтому тренд — это popular с ростом на текущий момент."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    hours = (django.utils.timezone.now()
+             - settings.RECIPE_TRENDING_EPOCH).total_seconds() / 3600
+    growth = 2 ** (hours / settings.RECIPE_TRENDING_HALF_LIFE)
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=recipe_id, popular=popular,
+                     trending=popular * growth)
+         for recipe_id, popular in (
+             (recipe_id, favorites * weights['favorite']
+              + carts * weights['cart'])
+             for recipe_id, favorites, carts in Recipe.objects.values_list(
+                 'id', 'favorites_count', 'cart_count').iterator())),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Тренд')),
+                ('updated_at', models.DateTimeField(null=True, verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time', '-id'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', '-recipe'], name='recipe_score_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'),
+        ),
+        migrations.RunPython(create_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.6 on 2026-10-17 07:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchEntry',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('document', models.TextField(db_column='recipes_recipe_fts', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Поисковая запись рецепта',
+                'verbose_name_plural': 'Поисковые записи рецептов',
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.6 on 2026-10-17 07:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_search_entry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+    ]
@@ -1,13 +1,15 @@
 from colorfield.fields import ColorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
-from backend.constants import (MAX_AMOUNT_CONST, MAX_COOKING_TIME_CONST,
-                               MEASUREMENT_UNIT_CONST, MIN_AMOUNT_CONST,
-                               MIN_COOKING_TIME_CONST, INGREDIENT_NAME_LEN,
-                               TAG_SLUG_LEN)
 from users.models import User
 
+from backend.constants import (INGREDIENT_NAME_LEN, MAX_AMOUNT_CONST,
+                               MAX_COOKING_TIME_CONST, MEASUREMENT_UNIT_CONST,
+                               MIN_AMOUNT_CONST, MIN_COOKING_TIME_CONST,
+                               TAG_SLUG_LEN)
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -69,6 +71,12 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         blank=False
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
     name = models.CharField(
         max_length=INGREDIENT_NAME_LEN,
         verbose_name='Hазвание',
@@ -92,11 +100,27 @@ class Recipe(models.Model):
         verbose_name='Дата создания',
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date', ]
+        indexes = (
+            models.Index(fields=['cooking_time', '-id'],
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+        )
 
 
 class RecipeIngredient(models.Model):
@@ -108,6 +132,7 @@ class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт'
     )
     amount = models.PositiveSmallIntegerField(
@@ -124,25 +149,42 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredient'
             ),
         )
+        # Ингредиенты рецепта читаются только из индекса.
+        indexes = (
+            models.Index(fields=['recipe', 'ingredient', 'amount'],
+                         name='recipe_ingredient_amount_idx'),
+        )
 
 
 class ShoppingCartFavorite(models.Model):
+    # Отдельные индексы не нужны: их заменяют составные в Meta.
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт'
     )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь'
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_recipe_%(class)s'),
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='%(class)s_recipe_user_idx'),
+        ]
         abstract = True
 
 
@@ -155,3 +197,86 @@ class ShoppingCart(ShoppingCartFavorite):
 class Favorite(ShoppingCartFavorite):
     class Meta(ShoppingCartFavorite.Meta):
         verbose_name = 'Избранное'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        )
+
+
+class RecipeScore(models.Model):
+    """Рейтинги рецепта для сортировки ленты; меняются при добавлении
+    в избранное и список покупок, см. recipes/scores.py."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт'
+    )
+    popular = models.FloatField(default=0, verbose_name='Популярность')
+    trending = models.FloatField(default=0, verbose_name='Тренд')
+    updated_at = models.DateTimeField(
+        null=True,
+        verbose_name='Пересчитано'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=['-popular', '-recipe'],
+                         name='recipe_score_popular_idx'),
+            models.Index(fields=['-trending', '-recipe'],
+                         name='recipe_score_trending_idx'),
+        )
+
+
+class RecipeSearchEntry(models.Model):
+    """Строка FTS5-таблицы полнотекстового поиска. Таблица есть только
+    в SQLite (миграция 0004_recipe_fts), заполняет её api/search.py."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry',
+        verbose_name='Рецепт'
+    )
+    # Скрытый столбец FTS5 с именем таблицы: слева от MATCH и в bm25().
+    document = models.TextField(
+        db_column='recipes_recipe_fts',
+        verbose_name='Документ'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+        verbose_name = 'Поисковая запись рецепта'
+        verbose_name_plural = 'Поисковые записи рецептов'
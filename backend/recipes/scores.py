@@ -0,0 +1,97 @@
+"""Рейтинги рецептов для сортировок popular и trending.
+
+popular — взвешенное число добавлений в избранное и список покупок.
+trending — та же сумма, но вклад добавления затухает вдвое за
+RECIPE_TRENDING_HALF_LIFE часов. Вместо того чтобы со временем уменьшать
+все значения, вклад добавления в момент t записывается как
+weight * 2 ** ((t - epoch) / half_life): порядок рецептов от этого не
+меняется, и сортировать можно по хранимым значениям. Оба рейтинга
+меняются через F() в момент добавления или удаления; удаление вычитает
+вклад по времени добавления записи, так что добавить и сразу убрать
+рецепт — то же, что не добавлять.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (ExpressionWrapper, F, FloatField, OuterRef,
+                              Subquery)
+from django.dispatch import Signal
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+BATCH_SIZE = 1000
+
+scores_refreshed = Signal()
+
+
+def get_growth(moment):
+    hours = (moment - settings.RECIPE_TRENDING_EPOCH).total_seconds() / 3600
+    return 2 ** (hours / settings.RECIPE_TRENDING_HALF_LIFE)
+
+
+def update_scores(event, recipe_ids, delta=1, created=None):
+    """Учитывает добавление (delta > 0) или удаление рецептов в избранное
+    (event='favorite') или список покупок (event='cart'). created —
+    время добавления записи, по умолчанию текущее: при удалении передаётся
+    время удаляемой записи, и из тренда вычитается ровно её вклад."""
+    if not recipe_ids:
+        return 0
+    weight = settings.RECIPE_SCORE_WEIGHTS[event]
+    growth = get_growth(created or timezone.now())
+    return RecipeScore.objects.filter(recipe_id__in=recipe_ids).update(
+        popular=F('popular') + weight * delta,
+        trending=F('trending') + weight * delta * growth)
+
+
+def get_popular():
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    return Subquery(Recipe.objects.filter(pk=OuterRef('recipe')).values(
+        value=ExpressionWrapper(
+            F('favorites_count') * weights['favorite']
+            + F('cart_count') * weights['cart'],
+            output_field=FloatField()))[:1])
+
+
+def get_trending():
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    trending = defaultdict(float)
+    for model, weight in ((Favorite, weights['favorite']),
+                          (ShoppingCart, weights['cart'])):
+        for recipe_id, created in model.objects.values_list(
+                'recipe_id', 'created').iterator():
+            trending[recipe_id] += weight * get_growth(created)
+    return trending
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает рейтинги всех рецептов с нуля: после сдвига
+    RECIPE_TRENDING_EPOCH, загрузки данных в обход API или для сверки.
+    Возвращает число рецептов с ненулевым трендом."""
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=recipe_id) for recipe_id in
+         Recipe.objects.filter(score__isnull=True).values_list(
+             'id', flat=True).iterator()),
+        batch_size=BATCH_SIZE)
+    RecipeScore.objects.update(popular=get_popular(), trending=0,
+                               updated_at=timezone.now())
+    trending = get_trending()
+    changed = list(RecipeScore.objects.in_bulk(list(trending)).values())
+    for score in changed:
+        score.trending = trending[score.pk]
+    RecipeScore.objects.bulk_update(changed, ['trending'],
+                                    batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def refresh(full=False):
+    """Сбрасывает закэшированные ленты с сортировкой по рейтингам;
+    запускается периодически. С full рейтинги сначала пересчитываются
+    с нуля. Возвращает число пересчитанных рецептов."""
+    changed = rebuild() if full else 0
+    transaction.on_commit(partial(scores_refreshed.send,
+                                  sender=RecipeScore))
+    return changed
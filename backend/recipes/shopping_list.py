@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(recipe):
+    return dict(RecipeIngredient.objects.filter(recipe=recipe).values_list(
+        'ingredient_id', 'amount'))
+
+
+@transaction.atomic
+def apply_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in deltas},
+            ingredient_id__in={ingredient_id for _, ingredient_id in deltas}
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        item = items.get((user_id, ingredient_id))
+        if item is None:
+            to_create.append(ShoppingListItem(user_id=user_id,
+                                              ingredient_id=ingredient_id,
+                                              total_amount=delta))
+            continue
+        item.total_amount += delta
+        if item.total_amount > 0:
+            to_update.append(item)
+        else:
+            to_delete.append(item.id)
+    ShoppingListItem.objects.bulk_create(
+        item for item in to_create if item.total_amount > 0)
+    ShoppingListItem.objects.bulk_update(to_update, ['total_amount'])
+    ShoppingListItem.objects.filter(id__in=to_delete).delete()
+
+
+def add_recipe(user_id, recipe_id, sign=1):
+    apply_deltas({(user_id, ingredient_id): sign * amount
+                  for ingredient_id, amount
+                  in get_recipe_amounts(recipe_id).items()})
+
+
+def add_recipes(user, recipe_ids):
+    totals = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids).values_list('ingredient_id').annotate(
+        total=Sum('amount')).order_by()
+    apply_deltas({(user.id, ingredient_id): total
+                  for ingredient_id, total in totals})
+
+
+def remove_recipe(user_id, recipe_id):
+    add_recipe(user_id, recipe_id, sign=-1)
+
+
+def change_recipe(recipe, old_amounts, new_amounts):
+    changes = {
+        ingredient_id: (new_amounts.get(ingredient_id, 0)
+                        - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+    changes = {key: value for key, value in changes.items() if value}
+    if not changes:
+        return
+    user_ids = ShoppingCart.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True)
+    apply_deltas({(user_id, ingredient_id): delta
+                  for user_id in user_ids
+                  for ingredient_id, delta in changes.items()})
+
+
+def delete_recipe(recipe):
+    change_recipe(recipe, get_recipe_amounts(recipe), {})
+
+
+def calculate(users=None):
+    if users is None:
+        queryset = RecipeIngredient.objects.filter(
+            recipe__shoppingcart__isnull=False)
+    else:
+        queryset = RecipeIngredient.objects.filter(
+            recipe__shoppingcart__user__in=users)
+    totals = queryset.values_list(
+        'recipe__shoppingcart__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    return {(user_id, ingredient_id): total
+            for user_id, ingredient_id, total in totals.iterator()}
+
+
+def get_stored(users=None):
+    queryset = ShoppingListItem.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    return {(user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in queryset.values_list(
+                'user_id', 'ingredient_id', 'total_amount').iterator()}
+
+
+@transaction.atomic
+def rebuild(users=None, batch_size=1000):
+    queryset = ShoppingListItem.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    queryset.delete()
+    totals = calculate(users)
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=amount)
+         for (user_id, ingredient_id), amount in totals.items()),
+        batch_size=batch_size)
+    return len(totals)
+
+
+def verify(users=None):
+    expected, stored = calculate(users), get_stored(users)
+    return {key: (stored.get(key, 0), expected.get(key, 0))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key, 0) != expected.get(key, 0)}
@@ -0,0 +1,81 @@
+import io
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.indexes import ingredient_index, recipe_ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def get_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANT_WORKERS=0)
+class APITestCase(TestCase):
+    """Кэши и индексы живут в памяти процесса и не откатываются вместе
+    с транзакцией теста, поэтому сбрасываются перед каждым тестом."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.user = cls.create_user('user')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль', 'яйца'))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        token_cache.clear()
+        ingredient_index.invalidate()
+        recipe_ingredient_index.invalidate()
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name=username, last_name=username, password='password')
+
+    def create_recipe(self, author=None, amounts=None, name='Рецепт'):
+        """Рецепт без изображения; amounts - {ингредиент: количество}."""
+        recipe = Recipe.objects.create(
+            author=author or self.author, name=name, text='Описание',
+            cooking_time=10, image='')
+        recipe.tags.set([self.tag])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in (amounts or {}).items())
+        return recipe
+
+    def get_client(self, user=None):
+        """Клиент с токеном: async-представления чтения не видят
+        force_authenticate."""
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def commit(self):
+        """Выполняет on_commit-обработчики: через них идёт инвалидация."""
+        return self.captureOnCommitCallbacks(execute=True)
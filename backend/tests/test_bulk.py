@@ -0,0 +1,108 @@
+import base64
+
+from recipes.counters import reconcile
+from recipes.models import Favorite, Recipe
+from tests.base import APITestCase, get_png
+from users.models import User
+
+MISSING_ID = 10 ** 6
+
+
+class BulkEndpointTest(APITestCase):
+    """Статусы пакетных эндпоинтов и счётчики после них."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self.create_recipe() for _ in range(2)]
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        # Данные созданы в обход API: счётчики выравниваются здесь.
+        reconcile()
+        self.client = self.get_client(self.user)
+
+    def post(self, url, ids):
+        response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {item['id']: item['status']
+                for item in response.json()['results']}
+
+    def test_favorite_statuses(self):
+        first, second = self.recipes
+        self.assertEqual(
+            self.post('/api/recipes/favorite/',
+                      [first.id, second.id, MISSING_ID]),
+            {first.id: 'exists', second.id: 'created',
+             MISSING_ID: 'not_found'})
+        self.assertEqual(
+            self.post('/api/recipes/favorite/', [second.id]),
+            {second.id: 'exists'})
+        self.assertEqual(Recipe.objects.get(pk=second.pk).favorites_count,
+                         1)
+        self.assertEqual(reconcile(fix=False), {})
+
+    def test_cart_statuses(self):
+        ids = [recipe.id for recipe in self.recipes]
+        self.assertEqual(self.post('/api/recipes/shopping_cart/', ids),
+                         dict.fromkeys(ids, 'created'))
+        self.assertEqual(self.post('/api/recipes/shopping_cart/', ids),
+                         dict.fromkeys(ids, 'exists'))
+        self.assertEqual(reconcile(fix=False), {})
+
+    def test_subscribe_statuses(self):
+        other = self.create_user('other')
+        self.assertEqual(
+            self.post('/api/users/subscribe/',
+                      [self.author.id, self.user.id, other.id, MISSING_ID]),
+            {self.author.id: 'created', self.user.id: 'self',
+             other.id: 'created', MISSING_ID: 'not_found'})
+        self.assertEqual(
+            self.post('/api/users/subscribe/', [self.author.id]),
+            {self.author.id: 'exists'})
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).subscribers_count, 1)
+        self.assertEqual(reconcile(fix=False), {})
+
+    def test_invalid_ids(self):
+        for data in ({}, {'ids': []}, {'ids': ['x']}):
+            with self.subTest(data=data):
+                response = self.client.post('/api/recipes/favorite/', data,
+                                            format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_anonymous(self):
+        response = self.get_client().post('/api/recipes/favorite/',
+                                          {'ids': [self.recipes[0].id]},
+                                          format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class CounterTest(APITestCase):
+    """Денормализованные счётчики не расходятся с данными."""
+
+    def test_counters_follow_api_changes(self):
+        client = self.get_client(self.user)
+        recipe = self.create_recipe()
+        reconcile()
+        client.post(f'/api/recipes/{recipe.id}/favorite/')
+        client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        client.post(f'/api/users/{self.author.id}/subscribe/')
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.favorites_count, recipe.cart_count), (1, 1))
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).subscribers_count, 1)
+        response = client.post(
+            '/api/recipes/',
+            {'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+             'tags': [self.tag.id],
+             'image': base64.b64encode(get_png()).decode(),
+             'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5},
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(pk=self.user.pk).recipes_count, 1)
+        self.assertEqual(reconcile(fix=False), {})
+        client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        client.delete(f'/api/users/{self.author.id}/subscribe/')
+        client.delete(f'/api/recipes/{response.json()["id"]}/')
+        self.assertEqual(reconcile(fix=False), {})
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.favorites_count, recipe.cart_count), (0, 0))
@@ -0,0 +1,130 @@
+from api.cache import (get_payload_keys, get_recipe_payloads,
+                       invalidate_recipe_payloads, payload_cache)
+from tests.base import APITestCase
+
+
+class RecipePayloadCacheTest(APITestCase):
+    """Закэшированное представление рецепта сбрасывается при изменениях."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(
+            amounts={self.ingredients[0]: 100})
+        self.client = self.get_client(self.user)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def get_recipe(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_recipe_update(self):
+        self.assertEqual(self.get_recipe()['name'], 'Рецепт')
+        with self.commit():
+            response = self.get_client(self.author).patch(
+                self.url, {'name': 'Блины'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_recipe()['name'], 'Блины')
+
+    def test_ingredient_rename(self):
+        self.assertEqual(self.get_recipe()['ingredients'][0]['name'], 'мука')
+        ingredient = self.ingredients[0]
+        ingredient.name = 'мука пшеничная'
+        with self.commit():
+            ingredient.save()
+        self.assertEqual(self.get_recipe()['ingredients'][0]['name'],
+                         'мука пшеничная')
+
+    def test_author_rename(self):
+        self.assertEqual(self.get_recipe()['author']['first_name'], 'author')
+        self.author.first_name = 'Автор'
+        with self.commit():
+            self.author.save()
+        self.assertEqual(self.get_recipe()['author']['first_name'], 'Автор')
+
+
+class DirtyMarkerTest(APITestCase):
+    """Представление, отрисованное до инвалидации, не попадает в кэш и
+    без реплик."""
+
+    def test_render_before_invalidation_not_cached(self):
+        recipe = self.create_recipe()
+
+        def render(recipes):
+            # Параллельный запрос прочитал рецепт до изменения, а кэш
+            # заполняет уже после инвалидации.
+            invalidate_recipe_payloads([recipe.id])
+            return {item.id: {'name': 'старое'} for item in recipes}
+
+        self.assertEqual(get_recipe_payloads([recipe], render),
+                         {recipe.id: {'name': 'старое'}})
+        self.assertEqual(
+            payload_cache.get_many(get_payload_keys([recipe]).values()), {})
+
+
+class PublicFeedCacheTest(APITestCase):
+    """ETag анонимной ленты меняется с поколением ленты."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_recipe()
+        self.client = self.get_client()
+
+    def test_not_modified_until_new_recipe(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.commit():
+            self.create_recipe(name='Новый рецепт')
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 2)
+
+
+class SubscriptionFeedCacheTest(APITestCase):
+    """Лента подписок пользователя сбрасывается при подписке и при новом
+    рецепте автора."""
+
+    def get_feed_ids(self, client):
+        response = client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.json()['results']}
+
+    def test_subscribe_and_new_recipe(self):
+        recipe = self.create_recipe()
+        client = self.get_client(self.user)
+        self.assertEqual(self.get_feed_ids(client), set())
+        with self.commit():
+            response = client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_feed_ids(client), {recipe.id})
+        with self.commit():
+            new_recipe = self.create_recipe(name='Новый рецепт')
+        self.assertEqual(self.get_feed_ids(client),
+                         {recipe.id, new_recipe.id})
+        with self.commit():
+            client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.get_feed_ids(client), set())
+
+
+class TokenCacheTest(APITestCase):
+    """Закэшированный токен перестаёт действовать сразу."""
+
+    def test_logout(self):
+        client = self.get_client(self.user)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        with self.commit():
+            response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_deactivated_user(self):
+        client = self.get_client(self.user)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        self.user.is_active = False
+        with self.commit():
+            self.user.save()
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
@@ -0,0 +1,54 @@
+import warnings
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from tests.base import APITestCase
+
+
+async def read_async(response):
+    return [chunk async for chunk in response]
+
+
+class DownloadShoppingCartTest(APITestCase):
+    """Выгрузка списка покупок под WSGI и под ASGI."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.user)
+        recipe = self.create_recipe(amounts={
+            ingredient: 100 for ingredient in self.ingredients})
+        with self.commit():
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def download(self, file_format):
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_async_iteration_streams_in_chunks(self):
+        expected = b''.join(self.download('txt').streaming_content)
+        self.assertIn('мука (г) — 100'.encode(), expected)
+        response = self.download('txt')
+        with mock.patch('api.utils.STREAM_CHUNK_SIZE', 32), \
+                warnings.catch_warnings():
+            warnings.simplefilter('error')
+            chunks = async_to_sync(read_async)(response)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), expected)
+
+    def test_formats(self):
+        for file_format, content_type in (
+                ('csv', 'text/csv; charset=utf-8'),
+                ('txt', 'text/plain; charset=utf-8')):
+            with self.subTest(file_format=file_format):
+                response = self.download(file_format)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertIn('сахар'.encode(),
+                              b''.join(response.streaming_content))
+
+    def test_empty_cart(self):
+        response = self.get_client(self.author).get(
+            '/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,26 @@
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient
+
+
+class ImportDataTest(TestCase):
+    def setUp(self):
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        with file:
+            file.write('мука,г\nсоль,г\nсоль,г\n')
+        self.path = file.name
+
+    def test_imports_in_batches(self):
+        call_command('import_data', self.path, '--batch-size=1')
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_rejects_batch_size_below_one(self):
+        for value in ('0', '-1'):
+            with self.subTest(value=value):
+                with self.assertRaises(CommandError):
+                    call_command('import_data', self.path,
+                                 f'--batch-size={value}')
+        self.assertFalse(Ingredient.objects.exists())
@@ -0,0 +1,54 @@
+from tests.base import APITestCase
+
+
+class UserFilterCountTest(APITestCase):
+    """Счётчики страниц для фильтров по избранному и списку покупок."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self.create_recipe() for _ in range(3)]
+        self.client = self.get_client(self.user)
+
+    def assert_listed(self, query, count):
+        response = self.client.get(f'/api/recipes/?{query}&limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], count)
+        self.assertEqual(len(response.json()['results']), min(count, 2))
+        if count > 2:
+            response = self.client.get(f'/api/recipes/?{query}&limit=2'
+                                       f'&page=2')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), count - 2)
+
+    def test_favorites_listed_after_favoriting(self):
+        self.assert_listed('is_favorited=1', 0)
+        for recipe in self.recipes:
+            with self.commit():
+                response = self.client.post(
+                    f'/api/recipes/{recipe.id}/favorite/')
+            self.assertEqual(response.status_code, 201)
+        self.assert_listed('is_favorited=1', 3)
+
+    def test_cart_listed_after_bulk_add(self):
+        self.assert_listed('is_in_shopping_cart=1', 0)
+        with self.commit():
+            response = self.client.post(
+                '/api/recipes/shopping_cart/',
+                {'ids': [recipe.id for recipe in self.recipes]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_listed('is_in_shopping_cart=1', 3)
+
+    def test_cursor_count_after_favoriting(self):
+        url = '/api/recipes/?pagination=cursor&count=1&is_favorited=1'
+        self.assertEqual(self.client.get(url).json()['count'], 0)
+        with self.commit():
+            self.client.post(f'/api/recipes/{self.recipes[0].id}/favorite/')
+        self.assertEqual(self.client.get(url).json()['count'], 1)
+
+    def test_author_count_after_new_recipe(self):
+        url = f'/api/recipes/?author={self.author.id}'
+        self.assertEqual(self.client.get(url).json()['count'], 3)
+        with self.commit():
+            self.create_recipe()
+        self.assertEqual(self.client.get(url).json()['count'], 4)
@@ -0,0 +1,81 @@
+import base64
+import json
+
+from rest_framework.exceptions import ValidationError
+
+from api.parsers import Base64ImageDecoder, JSONImageScanner
+from tests.base import APITestCase, get_png
+
+
+class Base64ImageDecoderTest(APITestCase):
+    """Изображение рецепта в base64 с заголовком data URL и без него."""
+
+    def decode(self, payload, chunk_size=3):
+        decoder = Base64ImageDecoder(max_size=1024 ** 2, max_side=100)
+        for start in range(0, len(payload), chunk_size):
+            decoder.feed(payload[start:start + chunk_size])
+        return decoder.finish()
+
+    def test_data_url_and_bare_base64(self):
+        png = get_png()
+        encoded = base64.b64encode(png)
+        for payload in (b'data:image/png;base64,' + encoded, encoded):
+            with self.subTest(payload=payload[:22]):
+                image = self.decode(payload)
+                self.assertTrue(image.name.endswith('.png'))
+                self.assertEqual(image.read(), png)
+                image.close()
+
+    def test_bare_base64_format_by_signature(self):
+        with self.assertRaises(ValidationError):
+            self.decode(base64.b64encode(b'not an image, just some text'))
+
+    def test_bad_data_url_header(self):
+        for payload in (b'data:text/plain;base64,AAAA',
+                        b'data:' + b'x' * 200):
+            with self.subTest(payload=payload[:22]):
+                with self.assertRaises(ValidationError):
+                    self.decode(payload)
+
+    def test_create_recipe_with_bare_base64(self):
+        with self.commit():
+            response = self.get_client(self.author).post(
+                '/api/recipes/',
+                {'ingredients': [{'id': self.ingredients[0].id,
+                                  'amount': 10}],
+                 'tags': [self.tag.id],
+                 'image': base64.b64encode(get_png()).decode(),
+                 'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5},
+                format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(response.json()['image'].endswith('.png'))
+
+
+class JSONImageScannerTest(APITestCase):
+    """Вырезается только строка image верхнего уровня, при любой
+    нарезке тела на части."""
+
+    class Decoder:
+        def __init__(self):
+            self.data = b''
+
+        def feed(self, data):
+            self.data += data
+
+    def scan(self, payload, chunk_size):
+        decoder = self.Decoder()
+        scanner = JSONImageScanner(b'image', decoder)
+        for start in range(0, len(payload), chunk_size):
+            scanner.feed(payload[start:start + chunk_size])
+        return json.loads(scanner.finish()), decoder.data
+
+    def test_only_top_level_image(self):
+        data = {'text': 'a "quoted" {text}: [x] \\ ', 'id': 1,
+                'nested': {'image': 'keep', 'list': [{'a': 1}, 2]},
+                'a"b': -2.5, 'image': 'QUJDRA==', 'name': 'Блины'}
+        payload = json.dumps(data, ensure_ascii=False).encode()
+        for chunk_size in (1, 2, 5, len(payload)):
+            with self.subTest(chunk_size=chunk_size):
+                parsed, image = self.scan(payload, chunk_size)
+                self.assertEqual(parsed, dict(data, image=None))
+                self.assertEqual(image, b'QUJDRA==')
@@ -0,0 +1,29 @@
+import re
+
+from django.test import override_settings
+
+from tests.base import APITestCase
+
+SERIALIZER_TIMING = re.compile(r'serializer;dur=([\d.]+)')
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1)
+class ServerTimingTest(APITestCase):
+    """Время сериализации попадает в замер и у async-представлений."""
+
+    def get_serializer_ms(self, url, user=None):
+        with self.assertLogs('performance'):
+            response = self.get_client(user).get(url)
+        self.assertEqual(response.status_code, 200)
+        return float(SERIALIZER_TIMING.search(
+            response['Server-Timing']).group(1))
+
+    def test_serializer_time_measured(self):
+        recipe = self.create_recipe(amounts={self.ingredients[0]: 100})
+        for url, user in (('/api/recipes/', None),
+                          ('/api/recipes/', self.user),
+                          (f'/api/recipes/{recipe.id}/', self.user),
+                          ('/api/tags/', None),
+                          ('/api/recipes/feed/', self.user)):
+            with self.subTest(url=url, user=user):
+                self.assertGreater(self.get_serializer_ms(url, user), 0)
@@ -0,0 +1,122 @@
+import base64
+
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe, RecipeIngredient, Tag
+from tests.base import APITestCase, get_png
+
+
+class RecipeUpdateTest(APITestCase):
+    """Ингредиенты обновляются по разнице, PATCH меняет только
+    переданные поля."""
+
+    def setUp(self):
+        super().setUp()
+        self.flour, self.sugar, self.salt, _ = self.ingredients
+        self.recipe = self.create_recipe(
+            amounts={self.flour: 200, self.sugar: 30})
+        self.client = self.get_client(self.author)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def get_rows(self):
+        return {ingredient_id: (row_id, amount)
+                for row_id, ingredient_id, amount
+                in RecipeIngredient.objects.filter(
+                    recipe=self.recipe).values_list(
+                        'id', 'ingredient_id', 'amount')}
+
+    def patch(self, data):
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_rows_kept_for_unchanged_ingredients(self):
+        rows = self.get_rows()
+        self.patch({'ingredients': [{'id': self.flour.id, 'amount': 250},
+                                    {'id': self.salt.id, 'amount': 5}]})
+        new_rows = self.get_rows()
+        self.assertEqual(new_rows.keys(), {self.flour.id, self.salt.id})
+        self.assertEqual(new_rows[self.flour.id],
+                         (rows[self.flour.id][0], 250))
+        self.assertEqual(new_rows[self.salt.id][1], 5)
+
+    def test_partial_update(self):
+        rows = self.get_rows()
+        data = self.patch({'name': 'Блины'})
+        self.assertEqual(data['name'], 'Блины')
+        self.assertEqual(self.get_rows(), rows)
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag])
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).cooking_time,
+                         10)
+
+    def test_tags_only(self):
+        tag = Tag.objects.create(name='Ужин', color='#49B64E', slug='dinner')
+        rows = self.get_rows()
+        data = self.patch({'tags': [tag.id]})
+        self.assertEqual([item['id'] for item in data['tags']], [tag.id])
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_duplicate_ingredients_rejected(self):
+        response = self.client.patch(
+            self.url,
+            {'ingredients': [{'id': self.flour.id, 'amount': 1},
+                             {'id': self.flour.id, 'amount': 2}]},
+            format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_create(self):
+        response = self.client.post(
+            '/api/recipes/',
+            {'ingredients': [{'id': self.flour.id, 'amount': 100},
+                             {'id': self.salt.id, 'amount': 2}],
+             'tags': [self.tag.id],
+             'image': 'data:image/png;base64,'
+                      + base64.b64encode(get_png()).decode(),
+             'name': 'Хлеб', 'text': 'Описание', 'cooking_time': 60},
+            format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            {(item['id'], item['amount'])
+             for item in response.json()['ingredients']},
+            {(self.flour.id, 100), (self.salt.id, 2)})
+
+
+class RecipeFlagsTest(APITestCase):
+    """Флаги is_favorited и is_in_shopping_cart считаются для каждого
+    пользователя, а число запросов не зависит от размера страницы."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self.create_recipe(name=f'Рецепт {index}')
+                        for index in range(6)]
+
+    def get_page(self, client, limit):
+        for cache in caches.all():
+            cache.clear()
+        response = client.get(f'/api/recipes/?limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id']: recipe for recipe in response.json()['results']}
+
+    def test_flags_per_user(self):
+        favorite = self.recipes[0]
+        first = self.get_client(self.user)
+        response = first.post(f'/api/recipes/{favorite.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(self.get_page(first, 6)[favorite.id]['is_favorited'])
+        second = self.get_client(self.create_user('second'))
+        page = self.get_page(second, 6)
+        self.assertEqual(len(page), 6)
+        self.assertFalse(any(recipe['is_favorited']
+                             or recipe['is_in_shopping_cart']
+                             for recipe in page.values()))
+
+    def test_queries_independent_of_page_size(self):
+        client = self.get_client(self.user)
+        client.post(f'/api/recipes/{self.recipes[0].id}/favorite/')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(len(self.get_page(client, 1)), 1)
+        self.assertGreater(len(context), 0)
+        with self.assertNumQueries(len(context)):
+            self.assertEqual(len(self.get_page(client, 6)), 6)
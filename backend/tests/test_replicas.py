@@ -0,0 +1,56 @@
+import sqlite3
+import tempfile
+
+from django.db import connection, connections
+from django.test import override_settings
+
+from tests.base import APITestCase
+
+REPLICA = 'replica_test'
+
+
+class ReplicaRouterTest(APITestCase):
+    """Реплика — отдельный SQLite-файл со снимком базы до данных теста:
+    ни пользователя, ни выданного ему токена на ней нет."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Снимок снимается до транзакции TestCase, а алиас добавляется
+        # после неё: файл реплики живёт вне отката и удаляется целиком.
+        cls.replica_file = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        connection.ensure_connection()
+        replica = sqlite3.connect(cls.replica_file.name)
+        connection.connection.backup(replica)
+        replica.close()
+        super().setUpClass()
+        connections.settings[REPLICA] = dict(
+            connections.settings['default'], NAME=cls.replica_file.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.replica_file.close()
+        super().tearDownClass()
+
+    def login(self, client):
+        response = client.post('/api/auth/token/login/',
+                               {'email': self.user.email,
+                                'password': 'password'})
+        self.assertEqual(response.status_code, 200, response.content)
+        # Клиент без cookie: привязка к default после входа не работает.
+        client.cookies.clear()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.json()["auth_token"]}')
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_new_token_on_replica_view(self):
+        self.create_recipe()
+        client = self.get_client()
+        self.login(client)
+        response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200, response.content)
+        # Сами рецепты читаются с отстающей реплики.
+        self.assertEqual(response.json()['count'], 0)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from recipes.models import RecipeScore
+from recipes.scores import get_growth, rebuild
+from tests.base import APITestCase
+
+
+@override_settings(RECIPE_SCORE_WEIGHTS={'favorite': 1.0, 'cart': 2.0},
+                   RECIPE_TRENDING_HALF_LIFE=48)
+class RecipeScoreTest(APITestCase):
+    """Рейтинги меняются при каждом добавлении и удалении."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.user)
+        self.recipes = [self.create_recipe() for _ in range(2)]
+
+    def get_scores(self):
+        return {score.recipe_id: (score.popular, score.trending)
+                for score in RecipeScore.objects.all()}
+
+    def test_favorite_and_cart_update_scores(self):
+        recipe = self.recipes[0]
+        self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.post('/api/recipes/shopping_cart/',
+                         {'ids': [recipe.id]}, format='json')
+        popular, trending = self.get_scores()[recipe.id]
+        self.assertEqual(popular, 3.0)
+        self.assertAlmostEqual(trending / get_growth(timezone.now()), 3.0,
+                               places=3)
+        self.client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        popular, trending = self.get_scores()[recipe.id]
+        self.assertEqual(popular, 0.0)
+        self.assertAlmostEqual(trending / get_growth(timezone.now()), 0.0,
+                               places=6)
+
+    def test_add_and_remove_does_not_raise_trending(self):
+        first, second = self.recipes
+        self.client.post(f'/api/recipes/{second.id}/favorite/')
+        for _ in range(3):
+            self.client.post(f'/api/recipes/{first.id}/favorite/')
+            self.client.delete(f'/api/recipes/{first.id}/favorite/')
+        scores = self.get_scores()
+        self.assertLess(scores[first.id][1], scores[second.id][1])
+
+    def test_newer_addition_trends_higher(self):
+        old, new = self.recipes
+        now = timezone.now()
+        with mock.patch('django.utils.timezone.now',
+                        return_value=now - timedelta(hours=48)):
+            self.client.post(f'/api/recipes/{old.id}/favorite/')
+            self.get_client(self.author).post(
+                f'/api/recipes/{old.id}/favorite/')
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.client.post(f'/api/recipes/{new.id}/favorite/')
+        scores = self.get_scores()
+        # Два добавления период полураспада назад весят как одно сейчас.
+        self.assertAlmostEqual(scores[old.id][1] / scores[new.id][1], 1.0)
+        response = self.client.get('/api/recipes/?ordering=popular')
+        self.assertEqual([recipe['id'] for recipe in
+                          response.json()['results']], [old.id, new.id])
+
+    def test_rebuild_matches_incremental_scores(self):
+        for recipe in self.recipes:
+            self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/'
+                         f'shopping_cart/')
+        with mock.patch('django.utils.timezone.now',
+                        return_value=timezone.now() + timedelta(hours=5)):
+            self.client.delete(f'/api/recipes/{self.recipes[1].id}/'
+                               f'favorite/')
+        incremental = self.get_scores()
+        self.assertEqual(rebuild(), 1)
+        growth = get_growth(timezone.now())
+        for recipe_id, (popular, trending) in self.get_scores().items():
+            self.assertEqual(popular, incremental[recipe_id][0])
+            self.assertAlmostEqual(trending / growth,
+                                   incremental[recipe_id][1] / growth,
+                                   places=3)
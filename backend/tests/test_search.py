@@ -0,0 +1,74 @@
+from django.db import connection
+
+from api.search import FTS_TABLE
+from tests.base import APITestCase
+
+
+class RecipeSearchTest(APITestCase):
+    """Полнотекстовый поиск FTS5: совпадения по префиксу, порядок BM25
+    и переиндексация при изменениях."""
+
+    def setUp(self):
+        super().setUp()
+        self.flour, self.sugar, self.salt, _ = self.ingredients
+        self.pancakes = self.add_recipe(
+            'Блины', 'Тонкие блины на молоке',
+            {self.flour: 200, self.sugar: 30})
+        self.bread = self.add_recipe('Хлеб', 'Домашний хлеб на закваске',
+                                     {self.flour: 500, self.salt: 10})
+        self.client = self.get_client(self.user)
+
+    def add_recipe(self, name, text, amounts):
+        with self.commit():
+            recipe = self.create_recipe(amounts=amounts, name=name)
+            recipe.text = text
+            recipe.save()
+        return recipe
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_match(self):
+        self.assertEqual(self.search('блин'), [self.pancakes.id])
+        self.assertEqual(self.search('закваске'), [self.bread.id])
+        self.assertEqual(self.search('соль'), [self.bread.id])
+        self.assertEqual(set(self.search('мука')),
+                         {self.pancakes.id, self.bread.id})
+        self.assertEqual(self.search('мука сахар'), [self.pancakes.id])
+        self.assertEqual(self.search('пирог'), [])
+
+    def test_bm25_order(self):
+        # Более новый рецепт шёл бы первым без сортировки по рангу.
+        in_name = self.add_recipe('Сырники', 'Из творога', {})
+        in_text = self.add_recipe('Запеканка', 'Почти как сырники', {})
+        self.assertEqual(self.search('сырники'), [in_name.id, in_text.id])
+
+    def test_reindex_on_recipe_rename(self):
+        with self.commit():
+            response = self.get_client(self.author).patch(
+                f'/api/recipes/{self.pancakes.id}/', {'name': 'Оладьи'},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('оладьи'), [self.pancakes.id])
+        # Слово осталось только в описании.
+        self.assertEqual(self.search('блины'), [self.pancakes.id])
+        self.assertEqual(self.search('Блины Оладьи'), [self.pancakes.id])
+
+    def test_reindex_on_ingredient_rename(self):
+        self.salt.name = 'соль морская'
+        with self.commit():
+            self.salt.save()
+        self.assertEqual(self.search('морская'), [self.bread.id])
+
+    def test_removed_on_delete(self):
+        with self.commit():
+            response = self.get_client(self.author).delete(
+                f'/api/recipes/{self.bread.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.search('хлеб'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} '
+                           f'WHERE rowid = %s', [self.bread.id])
+            self.assertEqual(cursor.fetchone(), (0,))
@@ -0,0 +1,103 @@
+from recipes import shopping_list
+from recipes.models import RecipeIngredient
+from tests.base import APITestCase
+
+
+class ShoppingListDeltaTest(APITestCase):
+    """Сводный список покупок меняется дельтами и совпадает с пересчётом
+    по корзине."""
+
+    def setUp(self):
+        super().setUp()
+        self.flour, self.sugar, self.salt, _ = self.ingredients
+        self.pancakes = self.create_recipe(
+            amounts={self.flour: 200, self.sugar: 30}, name='Блины')
+        self.bread = self.create_recipe(
+            amounts={self.flour: 500, self.salt: 10}, name='Хлеб')
+        self.client = self.get_client(self.user)
+
+    def get_totals(self):
+        self.assertEqual(shopping_list.verify([self.user]), {})
+        return {ingredient_id: amount for (_, ingredient_id), amount
+                in shopping_list.get_stored([self.user]).items()}
+
+    def add_to_cart(self, recipe):
+        response = self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_and_remove(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.bread)
+        self.assertEqual(self.get_totals(), {
+            self.flour.id: 700, self.sugar.id: 30, self.salt.id: 10})
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_totals(),
+                         {self.flour.id: 500, self.salt.id: 10})
+
+    def test_bulk_add(self):
+        response = self.client.post(
+            '/api/recipes/shopping_cart/',
+            {'ids': [self.pancakes.id, self.bread.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_totals(), {
+            self.flour.id: 700, self.sugar.id: 30, self.salt.id: 10})
+
+    def test_recipe_update_and_delete(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.bread)
+        author = self.get_client(self.author)
+        response = author.patch(
+            f'/api/recipes/{self.pancakes.id}/',
+            {'ingredients': [{'id': self.flour.id, 'amount': 250},
+                             {'id': self.salt.id, 'amount': 5}]},
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_totals(), {
+            self.flour.id: 750, self.salt.id: 15})
+        response = author.delete(f'/api/recipes/{self.bread.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_totals(),
+                         {self.flour.id: 250, self.salt.id: 5})
+
+    def test_other_users_unaffected(self):
+        self.add_to_cart(self.pancakes)
+        other = self.create_user('other')
+        self.get_client(other).post(
+            f'/api/recipes/{self.bread.id}/shopping_cart/')
+        self.assertEqual(self.get_totals(),
+                         {self.flour.id: 200, self.sugar.id: 30})
+        self.assertEqual(shopping_list.verify(), {})
+
+    def test_author_account_deleted(self):
+        salad = self.create_recipe(author=self.create_user('other'),
+                                   amounts={self.salt: 3}, name='Салат')
+        for recipe in (self.pancakes, self.bread, salad):
+            self.add_to_cart(recipe)
+        with self.commit():
+            response = self.get_client(self.author).delete(
+                f'/api/users/{self.author.id}/',
+                {'current_password': 'password'}, format='json')
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertEqual(self.get_totals(), {self.salt.id: 3})
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn(self.salt.name, content)
+        self.assertNotIn(self.flour.name, content)
+
+    def test_changes_outside_api(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.bread)
+        row = RecipeIngredient.objects.get(recipe=self.pancakes,
+                                           ingredient=self.flour)
+        row.amount = 150
+        row.save()
+        self.assertEqual(self.get_totals(), {
+            self.flour.id: 650, self.sugar.id: 30, self.salt.id: 10})
+        row.delete()
+        self.assertEqual(self.get_totals(), {
+            self.flour.id: 500, self.sugar.id: 30, self.salt.id: 10})
+        self.bread.delete()
+        self.assertEqual(self.get_totals(), {self.sugar.id: 30})
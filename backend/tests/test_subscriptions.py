@@ -0,0 +1,38 @@
+from recipes.counters import reconcile
+from tests.base import APITestCase
+from users.models import Subscription
+
+
+class SubscriptionRecipesLimitTest(APITestCase):
+    """recipes_limit обрезает рецепты автора и проверяется на входе."""
+
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            self.create_recipe(name=f'Рецепт {index}')
+        # Данные созданы в обход API: счётчики выравниваются здесь.
+        reconcile()
+        self.client = self.get_client(self.user)
+
+    def test_limit(self):
+        Subscription.objects.create(subscriber=self.user, author=self.author)
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 2})
+        self.assertEqual(response.status_code, 200)
+        author, = response.json()['results']
+        self.assertEqual(len(author['recipes']), 2)
+        self.assertEqual(author['recipes_count'], 3)
+
+    def test_invalid_limit(self):
+        Subscription.objects.create(subscriber=self.user, author=self.author)
+        for limit in ('abc', '-1', '1.5'):
+            with self.subTest(limit=limit):
+                response = self.client.get('/api/users/subscriptions/',
+                                           {'recipes_limit': limit})
+                self.assertEqual(response.status_code, 400)
+
+    def test_invalid_limit_on_subscribe(self):
+        response = self.client.post(
+            f'/api/users/{self.author.id}/subscribe/?recipes_limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscription.objects.exists())
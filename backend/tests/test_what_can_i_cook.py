@@ -0,0 +1,96 @@
+import base64
+
+from api.indexes import recipe_ingredient_index
+from tests.base import APITestCase, get_png
+
+
+class WhatCanICookTest(APITestCase):
+    """Инвертированный индекс меняется по месту при создании, правке и
+    удалении рецепта, а выдача отсортирована по покрытию."""
+
+    def setUp(self):
+        super().setUp()
+        self.flour, self.sugar, self.salt, self.eggs = self.ingredients
+        self.pancakes = self.create_recipe(
+            amounts={self.flour: 200, self.sugar: 30, self.eggs: 2},
+            name='Блины')
+        self.bread = self.create_recipe(
+            amounts={self.flour: 500, self.salt: 10}, name='Хлеб')
+        self.client = self.get_client(self.author)
+
+    def rank(self, *ingredients):
+        """Покрытие по индексу без перестройки: запросов к базе нет."""
+        with self.assertNumQueries(0):
+            return {recipe_id: round(coverage, 4) for recipe_id, coverage
+                    in recipe_ingredient_index.rank(
+                        [ingredient.id for ingredient in ingredients])}
+
+    def get_page(self, query):
+        response = self.client.get(f'/api/recipes/what_can_i_cook/{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_create_updates_index(self):
+        recipe_ingredient_index.rank([])
+        with self.commit():
+            response = self.client.post(
+                '/api/recipes/',
+                {'ingredients': [{'id': self.salt.id, 'amount': 5},
+                                 {'id': self.eggs.id, 'amount': 3}],
+                 'tags': [self.tag.id],
+                 'image': base64.b64encode(get_png()).decode(),
+                 'name': 'Омлет', 'text': 'Описание', 'cooking_time': 5},
+                format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.rank(self.salt), {
+            response.json()['id']: 0.5, self.bread.id: 0.5})
+
+    def test_ingredient_change_updates_index(self):
+        recipe_ingredient_index.rank([])
+        with self.commit():
+            response = self.client.patch(
+                f'/api/recipes/{self.pancakes.id}/',
+                {'ingredients': [{'id': self.flour.id, 'amount': 200},
+                                 {'id': self.salt.id, 'amount': 1}]},
+                format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.rank(self.sugar), {})
+        self.assertEqual(self.rank(self.salt), {
+            self.pancakes.id: 0.5, self.bread.id: 0.5})
+
+    def test_delete_updates_index(self):
+        recipe_ingredient_index.rank([])
+        with self.commit():
+            response = self.client.delete(f'/api/recipes/{self.bread.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.rank(self.salt), {})
+        self.assertEqual(self.rank(self.flour), {self.pancakes.id: 0.3333})
+
+    def test_ranked_by_coverage(self):
+        flatbread = self.create_recipe(amounts={self.flour: 300},
+                                       name='Лепёшка')
+        data = self.get_page(f'?ingredients={self.flour.id},{self.sugar.id}')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            [(recipe['id'], recipe['coverage']) for recipe in data['results']],
+            [(flatbread.id, 1.0), (self.pancakes.id, 0.6667),
+             (self.bread.id, 0.5)])
+
+    def test_pagination(self):
+        query = (f'?ingredients={self.flour.id}&ingredients={self.sugar.id}'
+                 f'&limit=1')
+        first = self.get_page(query)
+        self.assertEqual(first['count'], 2)
+        self.assertIsNotNone(first['next'])
+        second = self.get_page(query + '&page=2')
+        self.assertEqual([recipe['id'] for recipe in first['results']
+                          + second['results']],
+                         [self.pancakes.id, self.bread.id])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_ingredients(self):
+        for query in ('', '?ingredients=abc', '?ingredients=,'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f'/api/recipes/what_can_i_cook/{query}')
+                self.assertEqual(response.status_code, 400)
@@ -6,6 +6,8 @@ from .models import Subscription, User
 
 @admin.register(User)
 class UserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + ('recipes_count',
+                                             'subscribers_count')
     add_fieldsets = (
         (
             None,
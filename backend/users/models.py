@@ -16,6 +16,10 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=USER_NAME_FIELD_CONST, blank=False,
                                  verbose_name='Фамилия'
                                  )
+    recipes_count = models.PositiveIntegerField(default=0, editable=False,
+                                                verbose_name='Рецептов')
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчиков')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -23,11 +27,14 @@ class User(AbstractUser):
 
 
 class Subscription(models.Model):
+    # Отдельные индексы не нужны: их заменяют составные ниже.
     subscriber = models.ForeignKey(User, on_delete=models.CASCADE,
                                    related_name='subscriber',
+                                   db_index=False,
                                    verbose_name='Подписчик')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='author',
+                               db_index=False,
                                verbose_name='Автор')
 
     class Meta:
@@ -41,3 +48,7 @@ class Subscription(models.Model):
                 check=~models.Q(subscriber=models.F('author')),
                 name='self_subscribe',
             ))
+        indexes = (
+            models.Index(fields=['subscriber', 'author'],
+                         name='subscription_subscriber_idx'),
+        )